@@ -1,61 +1,298 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, Flask, current_app, render_template, request, jsonify, redirect, url_for, flash, stream_with_context, g
+from flask import before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from flask.cli import AppGroup, with_appcontext
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User
+from sqlalchemy import or_, select
+from models import db, User, configure_sqlite_engine, sqlite_engine_options
+from auth import LoginBusy, get_password_hasher, user_cache
+from storage import open_storage, migrate_json_to_sqlite, sort_key, validate_task_fields
+from search import MIN_PREFIX_LENGTH, SearchUnavailable
+from cache import get_cache
+from ids import new_task_id, reassign_duplicate_ids
+from transfer import export_ndjson, import_ndjson
+from metrics import DEFAULT_DIRECTORY, SamplingProfiler, collect, instrument_engine, registry, render_prometheus, timer
+import base64
+import binascii
+import hashlib
+import click
 import json
 from datetime import datetime
 import os
 import socket
-
-app = Flask(__name__)
+import time
 
 # Set base directory for the app
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Basic configurations
-app.config.update(
-    SECRET_KEY=os.environ.get('SECRET_KEY', 'your-secret-key'),
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    TESTING=False,
-    DATA_FILE=os.path.join(basedir, 'data', 'tasks.json')
-)
-
-# Set the database URI based on testing mode
-if app.config['TESTING']:
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "app.db")}'
-
-# Initialize extensions
-db.init_app(app)
+bp = Blueprint('main', __name__)
+
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+
+def default_config():
+    """Settings read from the environment when an app is created."""
+    return dict(
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'your-secret-key'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        TESTING=False,
+        DATA_FILE=os.environ.get('DATA_FILE', os.path.join(basedir, 'data', 'tasks.json')),
+        TASK_STORAGE=os.environ.get('TASK_STORAGE', 'json'),
+        TASK_DB_FILE=os.environ.get('TASK_DB_FILE', os.path.join(basedir, 'data', 'tasks.db')),
+        TASK_WRITE_BEHIND=os.environ.get('TASK_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes'),
+        TASK_JOURNAL_MAX_BYTES=int(os.environ.get('TASK_JOURNAL_MAX_BYTES', 1024 * 1024)),
+        TASK_JOURNAL_MAX_AGE=float(os.environ.get('TASK_JOURNAL_MAX_AGE', 1.0)),
+        TASK_PAGE_SIZE=50,
+        TASK_MAX_PAGE_SIZE=1000,
+        TASK_BATCH_LIMIT=10000,
+        USER_CACHE_TTL=int(os.environ.get('USER_CACHE_TTL', 60)),
+        USER_CACHE_SIZE=1024,
+        PASSWORD_HASH_METHOD=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        PASSWORD_HASH_WORKERS=int(os.environ.get('PASSWORD_HASH_WORKERS', 4)),
+        PASSWORD_HASH_MAX_PENDING=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32)),
+        PASSWORD_HASH_TIMEOUT=10.0,
+        SQLITE_JOURNAL_MODE=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        SQLITE_SYNCHRONOUS=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        SQLITE_BUSY_TIMEOUT_MS=int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        SQLITE_MMAP_SIZE=int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024)),
+        SQLITE_POOL_SIZE=int(os.environ.get('SQLITE_POOL_SIZE', 5)),
+        SQLITE_MAX_OVERFLOW=int(os.environ.get('SQLITE_MAX_OVERFLOW', 10)),
+        SQLITE_CACHED_STATEMENTS=256,
+        SQLITE_QUERY_CACHE_SIZE=500,
+        TASK_CHANGES_LIMIT=1000,
+        TASK_STREAM_POLL_INTERVAL=1.0,
+        TASK_STREAM_HEARTBEAT=15.0,
+        TASK_STREAM_MAX_SECONDS=300,
+        # Set METRICS_DIR to an empty string to only report this process
+        METRICS_DIR=os.environ.get('METRICS_DIR', DEFAULT_DIRECTORY) or None,
+        METRICS_FLUSH_INTERVAL=1.0,
+        PROFILE_SLOW_REQUEST_MS=int(os.environ.get('PROFILE_SLOW_REQUEST_MS', 0)),
+        PROFILE_INTERVAL_MS=5,
+        PROFILE_DIR=os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+    )
+
+def create_app(config=None):
+    """Build the application.
+
+    Nothing here touches the database or the task store: engines connect on
+    first use and the schema is created by ``flask init-db``, so building
+    an app (or forking a worker from a preloaded one) stays cheap.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
+
+    # Set the database URI based on testing mode
+    if 'SQLALCHEMY_DATABASE_URI' not in app.config:
+        if app.config['TESTING']:
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        else:
+            app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+                'DATABASE_URL', f'sqlite:///{os.path.join(basedir, "app.db")}')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(app.config)
+
+    # Initialize extensions
+    db.init_app(app)
+    with app.app_context():
+        configure_sqlite_engine(db.engine, app.config)
+        instrument_engine(db.engine)
+    login_manager.init_app(app)
+
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    user_cache.max_size = app.config['USER_CACHE_SIZE']
+
+    app.json = TimedJSONProvider(app)
+    app.before_request(start_request_timer)
+    app.after_request(record_request_time)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template_time, app)
+
+    app.register_blueprint(bp)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(tasks_cli)
+    return app
+
+def warm_up(app):
+    """Compile every template up front.
+
+    Called once in the gunicorn master (``--preload``) so forked workers
+    share the compiled templates instead of each parsing them on first use.
+    """
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+def __getattr__(name):
+    # ``from app import app`` (tests, FLASK_APP=app.py) builds a default app
+    # on first access instead of at import time
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def _load_user_from_db(user_id):
+    user = db.session.get(User, user_id)
+    if user is not None:
+        db.session.expunge(user)
+    return user
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), _load_user_from_db)
 
-# Create database tables if not testing
-if not app.config['TESTING']:
-    with app.app_context():
-        db.create_all()
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with timer('json_serialize_duration_seconds'):
+            return super().dumps(obj, **kwargs)
+
+_profilers = {}
+
+def get_profiler():
+    threshold_ms = current_app.config['PROFILE_SLOW_REQUEST_MS']
+    if not threshold_ms:
+        return None
+    key = (current_app.config['PROFILE_DIR'], threshold_ms, current_app.config['PROFILE_INTERVAL_MS'])
+    if key not in _profilers:
+        _profilers[key] = SamplingProfiler(key[0], threshold_ms / 1000, key[2] / 1000)
+    return _profilers[key]
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    profiler = get_profiler()
+    if profiler:
+        profiler.start()
+
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    registry.observe('http_request_duration_seconds', duration,
+                     method=request.method, route=route, status=str(response.status_code))
+    profiler = get_profiler()
+    if profiler:
+        profiler.stop(duration, f'{request.method} {route}')
+    if current_app.config['METRICS_DIR']:
+        registry.dump(current_app.config['METRICS_DIR'], current_app.config['METRICS_FLUSH_INTERVAL'])
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+def record_template_time(sender, template, context, **extra):
+    started = g.template_started.pop()
+    registry.observe('template_render_duration_seconds', time.perf_counter() - started,
+                     template=template.name)
 
 def get_data_file():
-    return app.config['DATA_FILE']
+    return current_app.config['DATA_FILE']
+
+def get_storage():
+    if current_app.config['TASK_STORAGE'] == 'sqlite':
+        backend, path = 'sqlite', current_app.config['TASK_DB_FILE']
+    else:
+        backend, path = 'json', get_data_file()
+    if not current_app.config['TASK_WRITE_BEHIND']:
+        return open_storage(backend, path)
+    return open_storage(backend, path, write_behind=True,
+                        max_bytes=current_app.config['TASK_JOURNAL_MAX_BYTES'],
+                        max_age=current_app.config['TASK_JOURNAL_MAX_AGE'])
+
+def get_task_cache():
+    return get_cache(get_storage())
 
 def load_tasks():
-    data_file = get_data_file()
-    if os.path.exists(data_file):
-        with open(data_file, 'r') as f:
-            return json.load(f)
-    return []
+    return get_storage().all()
 
 def save_tasks(tasks):
-    data_file = get_data_file()
-    os.makedirs(os.path.dirname(data_file), exist_ok=True)
-    with open(data_file, 'w') as f:
-        json.dump(tasks, f)
+    get_storage().replace_all(tasks)
+
+TASK_QUERY_ARGS = ('status', 'priority', 'created_from', 'created_to', 'sort', 'limit', 'cursor')
+
+def encode_cursor(task):
+    return base64.urlsafe_b64encode(json.dumps(sort_key(task)).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    # encode_cursor writes [created_at, id], both strings
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(part, str) for part in key)):
+        raise ValueError('Invalid cursor')
+    return tuple(key)
+
+def query_tasks(args, limit=None):
+    """Run a task query from request-style ``args``.
+
+    Returns ``(tasks, next_cursor)``; ``next_cursor`` is None on the last
+    page or when the query isn't paginated. Raises ValueError for bad input.
+    """
+    sort = args.get('sort', 'created_at')
+    if sort not in ('created_at', '-created_at'):
+        raise ValueError('sort must be created_at or -created_at')
+    if 'limit' in args:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit < 1:
+            raise ValueError('limit must be positive')
+    if limit is None and 'cursor' in args:
+        limit = current_app.config['TASK_PAGE_SIZE']
+    if limit is not None:
+        limit = min(limit, current_app.config['TASK_MAX_PAGE_SIZE'])
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+
+    tasks = get_storage().query(
+        status=args.get('status') or None,
+        priority=args.get('priority') or None,
+        created_from=args.get('created_from') or None,
+        created_to=args.get('created_to') or None,
+        descending=sort.startswith('-'),
+        after=after,
+        limit=None if limit is None else limit + 1
+    )
+    if limit is None or len(tasks) <= limit:
+        return tasks, None
+    tasks = tasks[:limit]
+    return tasks, encode_cursor(tasks[-1])
+
+def task_etag():
+    return hashlib.sha1(repr(get_storage().version()).encode()).hexdigest()[:20]
+
+def not_modified(etag):
+    """304 response if the client already has ``etag``, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def parse_since(value):
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('since must be a change sequence number')
+    if since < 0:
+        raise ValueError('since must be a change sequence number')
+    return since
+
+def build_task(data):
+    """New task from request data; raises ValueError for invalid fields."""
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    task = {
+        'id': new_task_id(),
+        'title': data.get('title'),
+        'description': data.get('description', ''),
+        'status': 'pending',
+        'priority': data.get('priority', 'medium'),
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    validate_task_fields(task)
+    return task
 
 def get_system_info():
     return {
@@ -64,7 +301,7 @@ def get_system_info():
         'current_user': os.getenv('USER', 'unknown')
     }
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         try:
@@ -74,19 +311,22 @@ def register():
 
             if not username or not password or not email:
                 flash('All fields are required')
-                return redirect(url_for('register'))
+                return redirect(url_for('.register'))
 
-            if User.query.filter_by(username=username).first():
+            # One lookup over both unique (indexed) columns
+            existing = User.query.filter(
+                or_(User.username == username, User.email == email)).limit(2).all()
+            if any(u.username == username for u in existing):
                 flash('Username already exists')
-                return redirect(url_for('register'))
+                return redirect(url_for('.register'))
 
-            if User.query.filter_by(email=email).first():
+            if existing:
                 flash('Email already registered')
-                return redirect(url_for('register'))
+                return redirect(url_for('.register'))
 
             user = User(
                 username=username,
-                password=generate_password_hash(password),
+                password=get_password_hasher(current_app.config).hash(password),
                 email=email
             )
             
@@ -94,84 +334,302 @@ def register():
             db.session.commit()
 
             flash('Registration successful!')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         except Exception as e:
-            print(f"Registration error: {str(e)}")
+            current_app.logger.exception('Registration error: %s', e)
             db.session.rollback()
             flash('An error occurred during registration')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
 
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
         user = User.query.filter_by(username=username).first()
+        hasher = get_password_hasher(current_app.config)
 
-        if user and check_password_hash(user.password, password):
+        try:
+            valid = user is not None and hasher.verify(user.password, password)
+        except LoginBusy:
+            flash('Too many login attempts, please try again')
+            return render_template('login.html'), 503
+
+        if valid:
+            if hasher.needs_rehash(user.password):
+                user.password = hasher.hash(password)
+                db.session.commit()
             login_user(user)
-            return redirect(url_for('home'))
+            return redirect(url_for('.home'))
 
         flash('Invalid username or password')
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/')
+@bp.route('/')
 @login_required
 def home():
-    tasks = load_tasks()
-    return render_template('index.html', tasks=tasks, system_info=get_system_info())
+    # Read the feed position first so no change made while rendering is missed
+    change_version = get_storage().latest_change()
+    tasks, next_cursor = query_tasks({}, limit=current_app.config['TASK_PAGE_SIZE'])
+    return render_template('index.html', tasks=tasks, next_cursor=next_cursor,
+                           page_size=current_app.config['TASK_PAGE_SIZE'], change_version=change_version,
+                           min_query_length=MIN_PREFIX_LENGTH, system_info=get_system_info())
 
-@app.route('/about')
+@bp.route('/about')
 def about():
     return render_template('about.html')
 
-@app.route('/api/tasks', methods=['GET'])
+@bp.route('/api/tasks', methods=['GET'])
 @login_required
 def get_tasks():
-    return jsonify(load_tasks())
+    etag = task_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if not any(arg in request.args for arg in TASK_QUERY_ARGS):
+        body = get_task_cache().tasks_json(current_app.json.dumps)
+        response = current_app.response_class(f'{body}\n', mimetype='application/json')
+    else:
+        try:
+            tasks, next_cursor = query_tasks(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            response = jsonify(tasks)
+        else:
+            response = jsonify({'tasks': tasks, 'next_cursor': next_cursor})
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/tasks/changes')
+@login_required
+def get_task_changes():
+    storage = get_storage()
+    if 'since' not in request.args:
+        return jsonify({'changes': [], 'latest': storage.latest_change(), 'reset': False})
+    try:
+        since = parse_since(request.args['since'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(storage.changes_since(since, current_app.config['TASK_CHANGES_LIMIT']))
 
-@app.route('/api/tasks', methods=['POST'])
+@bp.route('/api/tasks/stream')
+@login_required
+def stream_task_changes():
+    """Server-Sent Events version of the change feed.
+
+    Each connection holds a worker until TASK_STREAM_MAX_SECONDS, after
+    which the browser reconnects with Last-Event-ID. With sync gunicorn
+    workers prefer polling /api/tasks/changes.
+    """
+    storage = get_storage()
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = storage.latest_change() if since is None else parse_since(since)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    poll_interval = current_app.config['TASK_STREAM_POLL_INTERVAL']
+    heartbeat = current_app.config['TASK_STREAM_HEARTBEAT']
+    max_seconds = current_app.config['TASK_STREAM_MAX_SECONDS']
+    limit = current_app.config['TASK_CHANGES_LIMIT']
+
+    def events():
+        seq = since
+        started = last_sent = time.monotonic()
+        yield 'retry: 2000\n\n'
+        while time.monotonic() - started < max_seconds:
+            feed = storage.changes_since(seq, limit)
+            if feed['reset']:
+                seq = feed['latest']
+                yield f'id: {seq}\nevent: reset\ndata: {{}}\n\n'
+                last_sent = time.monotonic()
+            for change in feed['changes']:
+                seq = change['seq']
+                yield f'id: {seq}\nevent: change\ndata: {json.dumps(change)}\n\n'
+                last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= heartbeat:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            if not feed['changes']:
+                time.sleep(poll_interval)
+
+    return current_app.response_class(stream_with_context(events()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/tasks/search')
+@login_required
+def search_tasks():
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
+    limit = current_app.config['TASK_PAGE_SIZE']
+    if 'limit' in request.args:
+        try:
+            limit = int(request.args['limit'])
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+    limit = min(limit, current_app.config['TASK_MAX_PAGE_SIZE'])
+
+    etag = task_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        tasks = get_storage().search(text, status=request.args.get('status') or None,
+                                     priority=request.args.get('priority') or None, limit=limit)
+    except SearchUnavailable as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    response = jsonify({'tasks': tasks})
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(get_task_cache().stats())
+
+@bp.route('/api/tasks', methods=['POST'])
 @login_required
 def create_task():
     task = request.get_json()
-    tasks = load_tasks()
-    
-    new_task = {
-        'id': datetime.now().strftime('%Y%m%d%H%M%S'),
-        'title': task.get('title'),
-        'description': task.get('description', ''),
-        'status': 'pending',
-        'priority': task.get('priority', 'medium'),
-        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    tasks.append(new_task)
-    save_tasks(tasks)
+    try:
+        new_task = build_task(task)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    get_storage().insert(new_task)
     return jsonify(new_task), 201
 
-@app.route('/api/tasks/<task_id>', methods=['PUT'])
+def read_batch():
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON array of tasks')
+    if len(items) > current_app.config['TASK_BATCH_LIMIT']:
+        raise ValueError(f"At most {current_app.config['TASK_BATCH_LIMIT']} tasks per batch")
+    return items
+
+@bp.route('/api/tasks/batch', methods=['POST'])
+@login_required
+def create_tasks_batch():
+    try:
+        items = read_batch()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = []
+    new_tasks = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('title'), str) or not item['title']:
+            results.append({'status': 400, 'error': 'Each task needs a title'})
+            continue
+        try:
+            new_task = build_task(item)
+        except ValueError as e:
+            results.append({'status': 400, 'error': str(e)})
+            continue
+        new_tasks.append(new_task)
+        results.append({'status': 201, 'task': new_task})
+
+    if new_tasks:
+        get_storage().insert_many(new_tasks)
+    return jsonify({'results': results})
+
+@bp.route('/api/tasks/batch', methods=['PATCH'])
+@login_required
+def update_tasks_batch():
+    try:
+        items = read_batch()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = [None] * len(items)
+    updates = []
+    positions = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str):
+            results[i] = {'status': 400, 'error': 'Each update needs a task id'}
+            continue
+        try:
+            validate_task_fields(item)
+        except ValueError as e:
+            results[i] = {'status': 400, 'id': item['id'], 'error': str(e)}
+            continue
+        updates.append((item['id'], item))
+        positions.append(i)
+
+    updated = get_storage().update_many(updates) if updates else []
+    for i, (task_id, _), task in zip(positions, updates, updated):
+        if task is None:
+            results[i] = {'status': 404, 'id': task_id, 'error': 'Task not found'}
+        else:
+            results[i] = {'status': 200, 'task': task}
+    return jsonify({'results': results})
+
+@bp.route('/api/tasks/export')
+@login_required
+def export_tasks():
+    lines = export_ndjson(get_storage())
+    return current_app.response_class(stream_with_context(lines), mimetype='application/x-ndjson',
+                              headers={'Content-Disposition': 'attachment; filename=tasks.ndjson'})
+
+@bp.route('/api/tasks/import', methods=['POST'])
+@login_required
+def import_tasks():
+    imported, errors = import_ndjson(get_storage(), request.stream)
+    return jsonify({'imported': imported, 'errors': errors})
+
+@bp.route('/api/tasks/<task_id>', methods=['GET'])
+@login_required
+def get_task(task_id):
+    etag = task_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    task = get_storage().get(task_id)
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    response = jsonify(task)
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/tasks/<task_id>', methods=['PUT'])
 @login_required
 def update_task(task_id):
-    tasks = load_tasks()
     task_update = request.get_json()
-    
-    for task in tasks:
-        if task['id'] == task_id:
-            task.update(task_update)
-            save_tasks(tasks)
-            return jsonify(task)
-            
-    return jsonify({'error': 'Task not found'}), 404
+    try:
+        validate_task_fields(task_update)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    task = get_storage().update(task_id, task_update)
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    return jsonify(task)
+
+@bp.route('/api/tasks/<task_id>', methods=['DELETE'])
+@login_required
+def delete_task(task_id):
+    if not get_storage().delete(task_id):
+        return jsonify({'error': 'Task not found'}), 404
+    return '', 204
+
+@bp.route('/api/metrics')
+def prometheus_metrics():
+    histograms, counters = collect(current_app.config['METRICS_DIR'])
+    return current_app.response_class(render_prometheus(histograms, counters),
+                              mimetype='text/plain; version=0.0.4')
 
-@app.route('/api/health')
+@bp.route('/api/health')
 def health_check():
     return jsonify({
         'status': 'healthy',
@@ -179,5 +637,91 @@ def health_check():
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     })
 
+@bp.route('/api/ready')
+def readiness_check():
+    """Readiness probe: can this worker reach the task store and the users DB?
+
+    Unlike /api/health this touches both, so keep it cheap: a version stamp
+    and a one-row query that also fails if ``flask init-db`` hasn't run.
+    """
+    checks = {}
+    try:
+        get_storage().version()
+        checks['storage'] = 'ok'
+    except Exception:
+        # Details go to the log only, the probe is unauthenticated
+        current_app.logger.exception('Readiness check failed for task storage')
+        checks['storage'] = 'error'
+    try:
+        db.session.execute(select(User.id).limit(1))
+        checks['database'] = 'ok'
+    except Exception:
+        current_app.logger.exception('Readiness check failed for the users database')
+        db.session.rollback()
+        checks['database'] = 'error'
+    ready = all(result == 'ok' for result in checks.values())
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the users database schema. Run once per deploy, before starting workers."""
+    db.create_all()
+    click.echo('Initialized the database')
+
+tasks_cli = AppGroup('tasks', help='Task storage maintenance commands.')
+
+@tasks_cli.command('migrate')
+@click.option('--source', default=None, help='JSON board to migrate (defaults to DATA_FILE).')
+@click.option('--target', default=None, help='SQLite file to migrate into (defaults to TASK_DB_FILE).')
+def migrate_tasks(source, target):
+    """Copy the JSON task board into the SQLite storage backend."""
+    source = source or get_data_file()
+    target = target or current_app.config['TASK_DB_FILE']
+    try:
+        migrated, already_present = migrate_json_to_sqlite(source, target)
+    except ValueError as e:
+        raise click.ClickException(f'{e}. Run `flask tasks dedupe` first.')
+    click.echo(f'Migrated {migrated} tasks to {target} ({already_present} already present)')
+
+@tasks_cli.command('flush')
+def flush_tasks():
+    """Compact the write-behind journal into the main task store."""
+    storage = get_storage()
+    if hasattr(storage, 'flush'):
+        storage.flush()
+        click.echo('Journal flushed')
+    else:
+        click.echo('Write-behind is not enabled')
+
+@tasks_cli.command('dedupe')
+def dedupe_tasks():
+    """Give tasks that share an id a fresh, unique id."""
+    storage = get_storage()
+    tasks = [dict(task) for task in storage.all()]
+    renamed = reassign_duplicate_ids(tasks)
+    if renamed:
+        storage.replace_all(tasks)
+    click.echo(f'Reassigned {renamed} duplicate task ids')
+
+@tasks_cli.command('export')
+@click.argument('output', type=click.File('w'), default='-')
+def export_tasks_command(output):
+    """Write every task to OUTPUT (default stdout) as NDJSON."""
+    for line in export_ndjson(get_storage()):
+        output.write(line)
+
+@tasks_cli.command('import')
+@click.argument('source', type=click.File('r'), default='-')
+def import_tasks_command(source):
+    """Load NDJSON tasks from SOURCE (default stdin), replacing tasks with the same id."""
+    imported, errors = import_ndjson(get_storage(), source)
+    for error in errors:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f'Imported {imported} tasks', err=True)
+
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        db.create_all()
     app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
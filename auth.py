@@ -0,0 +1,128 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models import User
+
+
+class UserCache:
+    """Small TTL + LRU cache of ``User`` objects for the login manager.
+
+    Cached users are detached from the session so a commit in one request
+    can't expire them for the next. Entries are dropped when the user row
+    changes in this process; other workers see the change once the TTL runs
+    out.
+    """
+
+    def __init__(self, ttl=60, max_size=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, loader):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        user = loader(user_id)
+        if user is not None:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(User, _event, _invalidate_user)
+
+
+class LoginBusy(Exception):
+    """Raised when too many password checks are queued, or one takes too long."""
+
+
+class PasswordHasher:
+    """Hashes and checks passwords with a configurable method.
+
+    Checks run in a bounded thread pool: hashlib releases the GIL while
+    hashing, so a burst of logins uses at most ``workers`` threads. Once
+    ``max_pending`` checks are running or queued, further attempts fail
+    fast with ``LoginBusy``. The limits are per process and the caller
+    waits for its check, so they only keep other requests flowing when a
+    process serves requests from several threads (gunicorn ``gthread``
+    workers with ``--threads`` above ``max_pending``).
+    """
+
+    def __init__(self, method='scrypt', workers=4, max_pending=32, timeout=10.0):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method)
+
+    def verify(self, stored_hash, password):
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self._executor.submit(check_password_hash, stored_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The check keeps its slot until it finishes in the background
+            raise LoginBusy()
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != _method_prefix(self.method)
+
+
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method):
+    # werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'),
+    # so hash once to learn the exact prefix the configured method produces
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def get_password_hasher(config):
+    settings = (config['PASSWORD_HASH_METHOD'], config['PASSWORD_HASH_WORKERS'],
+                config['PASSWORD_HASH_MAX_PENDING'], config['PASSWORD_HASH_TIMEOUT'])
+    # Pool threads don't survive a fork, so each worker builds its own
+    key = (os.getpid(),) + settings
+    with _hashers_lock:
+        if key not in _hashers:
+            _hashers[key] = PasswordHasher(*settings)
+        return _hashers[key]
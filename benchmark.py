@@ -0,0 +1,419 @@
+"""Load/benchmark harness for the task API.
+
+Seeds a throwaway board of each requested size, drives a weighted mix of
+API calls from concurrent clients and prints one JSON document with
+p50/p99 latency, throughput and memory per endpoint, plus how long a
+fresh interpreter takes to build the app (cold start).
+
+    python benchmark.py --sizes 1000,100000 --clients 8 --requests 2000
+    python benchmark.py --target gunicorn --workers 4 --backend sqlite
+
+``--target client`` runs in-process through the Flask test client;
+``--target gunicorn`` starts a local gunicorn on a free port. Everything
+runs against a temporary directory, never the real data files.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+STATUSES = ('pending', 'in-progress', 'completed')
+PRIORITIES = ('low', 'medium', 'high')
+DEFAULT_MIX = 'list_page=40,get=25,update=20,create=10,list_all=4,login=1'
+BENCH_USER = {'username': 'bench', 'password': 'bench-password', 'email': 'bench@example.com'}
+SEED_CHUNK = 50000
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise SystemExit(f'unknown operation in --mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed_tasks(size, seed=0):
+    """Yield ``size`` synthetic tasks with time-ordered ids."""
+    from ids import IDGenerator
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    clock = [start.timestamp()]
+    generator = IDGenerator(worker_id=0, clock=lambda: clock[0])
+    for i in range(size):
+        clock[0] += 0.05
+        yield {
+            'id': generator.next_id(),
+            'title': f'Task {i}',
+            'description': f'Seeded task number {i}',
+            'status': rng.choice(STATUSES),
+            'priority': rng.choice(PRIORITIES),
+            'created_at': (start + timedelta(seconds=i // 20)).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+def seed_board(backend, path, size):
+    """Write a board straight through the storage layer and return its ids."""
+    from storage import open_storage
+    storage = open_storage(backend, path)
+    ids = []
+    chunk = []
+    for task in seed_tasks(size):
+        ids.append(task['id'])
+        chunk.append(task)
+        if len(chunk) >= SEED_CHUNK:
+            storage.insert_many(chunk)
+            chunk = []
+    if chunk:
+        storage.insert_many(chunk)
+    return ids
+
+
+class FlaskClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        body = response.get_data()
+        response.close()
+        return response.status_code, len(body)
+
+
+class HTTPSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirect())
+
+    def request(self, method, path, json_body=None, form=None):
+        headers = {}
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def op_list_page(session, ids, rng):
+    params = urllib.parse.urlencode({'limit': 50, 'status': rng.choice(STATUSES)})
+    return session.request('GET', f'/api/tasks?{params}')
+
+def op_list_all(session, ids, rng):
+    return session.request('GET', '/api/tasks')
+
+def op_get(session, ids, rng):
+    return session.request('GET', f'/api/tasks/{rng.choice(ids)}')
+
+def op_update(session, ids, rng):
+    return session.request('PUT', f'/api/tasks/{rng.choice(ids)}',
+                           json_body={'status': rng.choice(STATUSES)})
+
+def op_create(session, ids, rng):
+    return session.request('POST', '/api/tasks', json_body={
+        'title': 'Benchmark task',
+        'description': 'Created by benchmark.py',
+        'priority': rng.choice(PRIORITIES)
+    })
+
+def op_search(session, ids, rng):
+    params = urllib.parse.urlencode({'q': f'seeded task {rng.randrange(len(ids))}', 'limit': 20})
+    return session.request('GET', f'/api/tasks/search?{params}')
+
+def op_login(session, ids, rng):
+    return session.request('POST', '/login', form={
+        'username': BENCH_USER['username'], 'password': BENCH_USER['password']})
+
+OPERATIONS = {
+    'list_page': op_list_page,
+    'search': op_search,
+    'list_all': op_list_all,
+    'get': op_get,
+    'update': op_update,
+    'create': op_create,
+    'login': op_login,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_workload(make_session, ids, mix, clients, requests, seed=0):
+    """Run ``requests`` operations spread over ``clients`` threads."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+
+    def client(index):
+        rng = random.Random(seed + index)
+        session = make_session()
+        op_login(session, ids, rng)
+        local = []
+        for _ in range(per_client[index]):
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            status, _ = OPERATIONS[name](session, ids, rng)
+            local.append((name, time.perf_counter() - started, status))
+        with lock:
+            for name, elapsed, status in local:
+                samples[name].append(elapsed)
+                if status >= 400:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        values = sorted(samples[name])
+        endpoints[name] = {
+            'count': len(values),
+            'errors': errors[name],
+            'p50_ms': None if not values else round(percentile(values, 0.50) * 1000, 3),
+            'p99_ms': None if not values else round(percentile(values, 0.99) * 1000, 3),
+            'throughput_rps': round(len(values) / wall, 2) if wall else None,
+        }
+    total = sum(len(values) for values in samples.values())
+    return {
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(total / wall, 2) if wall else None,
+        'endpoints': endpoints,
+    }
+
+
+def self_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def process_tree_rss_mb(pid):
+    """Current RSS of ``pid`` and its children, from /proc (Linux only)."""
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        return None
+    total_kb = 0
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def bench_environment(workdir, backend, write_behind=False):
+    return {
+        'DATA_FILE': os.path.join(workdir, 'tasks.json'),
+        'TASK_DB_FILE': os.path.join(workdir, 'tasks.db'),
+        'TASK_STORAGE': backend,
+        'TASK_WRITE_BEHIND': '1' if write_behind else '',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'users.db')}",
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    }
+
+
+def create_bench_user(app):
+    from auth import get_password_hasher
+    from models import db, User
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username=BENCH_USER['username'], email=BENCH_USER['email'],
+                            password=get_password_hasher(app.config).hash(BENCH_USER['password'])))
+        db.session.commit()
+
+
+def run_client_target(args, size, mix):
+    # The app reads these when it is created and storages are cached per
+    # process, so each size runs in a fresh interpreter (see main).
+    from app import create_app
+    app = create_app()
+    create_bench_user(app)
+    ids = seed_board(args.backend, app.config['TASK_DB_FILE'] if args.backend == 'sqlite'
+                     else app.config['DATA_FILE'], size)
+    result = run_workload(lambda: FlaskClientSession(app), ids, mix, args.clients, args.requests)
+    result['rss_mb'] = self_rss_mb()
+    return result
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def run_gunicorn_target(args, size, mix, env):
+    from app import create_app
+    app = create_app()
+    create_bench_user(app)
+    ids = seed_board(args.backend, env['TASK_DB_FILE'] if args.backend == 'sqlite'
+                     else env['DATA_FILE'], size)
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--preload',
+               '--workers', str(args.workers), '--log-level', 'warning', 'wsgi:app']
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BASEDIR, env=dict(os.environ, **env),
+                              stdout=subprocess.DEVNULL)
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        wait_for(base_url + '/api/ready', timeout=30)
+        cold_start = time.perf_counter() - started
+        result = run_workload(lambda: HTTPSession(base_url), ids, mix, args.clients, args.requests)
+        result['rss_mb'] = process_tree_rss_mb(server.pid)
+        result['cold_start_seconds'] = round(cold_start, 3)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return result
+
+
+def measure_cold_start(env, runs):
+    """Median wall time for a fresh interpreter to import ``wsgi`` (build the app)."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import wsgi'], cwd=BASEDIR, env=env, check=True)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return round(timings[len(timings) // 2], 3) if timings else None
+
+
+def run_single(args):
+    """Run one board size in this process and print its result as JSON."""
+    mix = parse_mix(args.mix)
+    size = int(args.sizes)
+    env = {key: os.environ[key] for key in bench_environment('', args.backend)}
+    started = time.perf_counter()
+    if args.target == 'gunicorn':
+        result = run_gunicorn_target(args, size, mix, env)
+    else:
+        result = run_client_target(args, size, mix)
+    result.update(size=size, backend=args.backend, target=args.target, write_behind=args.write_behind,
+                  total_seconds=round(time.perf_counter() - started, 3))
+    json.dump(result, sys.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000',
+                        help='comma separated board sizes to seed (default: %(default)s)')
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--target', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--write-behind', action='store_true',
+                        help='journal task writes and compact them in the background')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--clients', type=int, default=4, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per board size')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='operation weights, name=weight,... (default: %(default)s)')
+    parser.add_argument('--cold-starts', type=int, default=3,
+                        help='fresh interpreters to time importing the app (default: %(default)s)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    parse_mix(args.mix)
+
+    if args.single:
+        run_single(args)
+        return
+
+    runs = []
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        workdir = tempfile.mkdtemp(prefix='task-bench-')
+        try:
+            env = dict(os.environ, **bench_environment(workdir, args.backend, args.write_behind))
+            command = [sys.executable, os.path.abspath(__file__), '--single',
+                       '--sizes', str(size), '--backend', args.backend, '--target', args.target,
+                       '--workers', str(args.workers), '--clients', str(args.clients),
+                       '--requests', str(args.requests), '--mix', args.mix]
+            if args.write_behind:
+                command.append('--write-behind')
+            output = subprocess.run(command, cwd=BASEDIR, env=env, check=True,
+                                    stdout=subprocess.PIPE).stdout
+            runs.append(json.loads(output))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    workdir = tempfile.mkdtemp(prefix='task-bench-')
+    try:
+        env = dict(os.environ, **bench_environment(workdir, args.backend, args.write_behind))
+        cold_start = measure_cold_start(env, args.cold_starts)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mix': parse_mix(args.mix),
+        'cold_start_seconds': cold_start,
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import threading
+
+from metrics import registry
+
+
+class TaskCache:
+    """Per-process cache of the parsed task board.
+
+    Entries are keyed on ``storage.version()``, which every backend derives
+    from state shared between gunicorn workers (file stat or a generation
+    counter in the database), so a write made by any worker invalidates the
+    cache everywhere. The cached list is shared between requests and must be
+    treated as read-only.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version = object()
+        self._tasks = None
+        self._body = None
+
+    def _refresh(self):
+        # Read the stamp before the data: if a write lands in between we
+        # cache newer data under an older stamp, which only costs a reload.
+        version = self.storage.version()
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                registry.inc('task_cache_requests_total', result='hit')
+                return
+            self.misses += 1
+            registry.inc('task_cache_requests_total', result='miss')
+        tasks = self.storage.all()
+        with self._lock:
+            self._version = version
+            self._tasks = tasks
+            self._body = None
+
+    def tasks(self):
+        self._refresh()
+        return self._tasks
+
+    def tasks_json(self, dumps):
+        """Return the board serialized with ``dumps``, built once per version."""
+        self._refresh()
+        with self._lock:
+            if self._body is None:
+                self._body = dumps(self._tasks)
+            return self._body
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(storage):
+    with _caches_lock:
+        if storage not in _caches:
+            _caches[storage] = TaskCache(storage)
+        return _caches[storage]
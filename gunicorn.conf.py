@@ -0,0 +1,37 @@
+import os
+
+from metrics import DEFAULT_DIRECTORY, registry, remove_worker_file
+
+
+def metrics_directory():
+    return os.environ.get('METRICS_DIR', DEFAULT_DIRECTORY)
+
+
+def child_exit(server, worker):
+    # Otherwise a recycled worker's totals would be summed forever
+    directory = metrics_directory()
+    if directory:
+        remove_worker_file(directory, worker.pid)
+
+
+def when_ready(server):
+    # With --preload the app was loaded, and its startup timed, in the
+    # master. Its own file holds those metrics once for the whole pool.
+    if server.cfg.preload_app and metrics_directory():
+        registry.dump(metrics_directory())
+
+
+def post_fork(server, worker):
+    # Otherwise every worker would report the master's metrics again
+    if server.cfg.preload_app:
+        registry.reset()
+
+
+def post_worker_init(worker):
+    # Start the in-memory search index now instead of in the first search
+    from app import get_storage
+    try:
+        with worker.wsgi.app_context():
+            get_storage().warm_search()
+    except Exception:
+        worker.log.exception('Could not start building the search index')
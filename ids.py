@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+# Crockford base32: no I, L, O or U, and ASCII order matches numeric order
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_LENGTH = 16
+
+TIMESTAMP_BITS = 48
+# Wide enough for any Linux pid (PID_MAX_LIMIT is 2**22)
+WORKER_BITS = 22
+SEQUENCE_BITS = 10
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def encode(value, length=ID_LENGTH):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+class IDGenerator:
+    """Snowflake-style task ids that sort by creation time.
+
+    An id packs a millisecond timestamp, a worker id and a per-millisecond
+    sequence into 80 bits, written as 16 base32 characters so string order
+    is creation order. The worker id defaults to the whole process id,
+    which keeps live gunicorn workers on the same host apart without any
+    shared lock; processes on different hosts need distinct worker ids.
+
+    Past ``MAX_SEQUENCE`` ids in one millisecond the generator moves on to
+    the next millisecond ahead of the clock rather than waiting for it.
+    """
+
+    def __init__(self, worker_id=None, clock=time.time):
+        self._fixed_worker_id = worker_id
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    @property
+    def worker_id(self):
+        if self._fixed_worker_id is not None:
+            return self._fixed_worker_id & ((1 << WORKER_BITS) - 1)
+        # Looked up on every call so forked workers pick up their own pid
+        return os.getpid() & ((1 << WORKER_BITS) - 1)
+
+    def _now_ms(self):
+        return int(self._clock() * 1000)
+
+    def next_id(self):
+        with self._lock:
+            now = self._now_ms()
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                # Same millisecond, or the clock went backwards: stay on the
+                # last timestamp so ids keep increasing
+                self._sequence += 1
+            else:
+                self._last_ms += 1
+                self._sequence = 0
+            value = (((self._last_ms << WORKER_BITS) | self.worker_id) << SEQUENCE_BITS) | self._sequence
+        return encode(value)
+
+
+_generator = IDGenerator()
+
+
+def new_task_id():
+    return _generator.next_id()
+
+
+def reassign_duplicate_ids(tasks, new_id=new_task_id):
+    """Give every repeated id after its first occurrence a fresh id.
+
+    Works in place and returns the number of tasks that were renamed.
+    """
+    seen = set()
+    renamed = 0
+    for task in tasks:
+        if task['id'] in seen:
+            task['id'] = new_id()
+            renamed += 1
+        seen.add(task['id'])
+    return renamed
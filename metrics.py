@@ -0,0 +1,274 @@
+import collections
+import contextlib
+import functools
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+
+# Where workers share their metrics unless METRICS_DIR says otherwise. It is
+# per host (per container): pids in it are checked against running processes.
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), 'task-tracker-metrics')
+
+# Prometheus' default latency buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_request_duration_seconds': 'Request latency by route',
+    'task_storage_duration_seconds': 'Time spent loading and saving tasks',
+    'json_serialize_duration_seconds': 'Time spent serializing JSON responses',
+    'template_render_duration_seconds': 'Time spent rendering templates',
+    'db_query_duration_seconds': 'Time spent in SQL queries on the users database',
+    'task_cache_requests_total': 'Task cache lookups by result',
+    'app_startup_seconds': 'Time to import and build the app before serving',
+}
+
+
+class Registry:
+    """Histograms and counters for one process.
+
+    Keys are ``(name, ((label, value), ...))``. With ``METRICS_DIR`` set,
+    each process dumps its registry to a file there so any worker can serve
+    totals for the whole gunicorn pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = collections.Counter()
+        self._last_dump = 0.0
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(BUCKETS) + [0, 0.0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def reset(self):
+        """Forget everything observed so far."""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': [[name, list(labels), list(values)]
+                               for (name, labels), values in self.histograms.items()],
+                'counters': [[name, list(labels), value]
+                             for (name, labels), value in self.counters.items()],
+            }
+
+    def dump(self, directory, min_interval=0.0):
+        """Write this process' metrics to ``directory``, at most every ``min_interval`` s."""
+        now = time.monotonic()
+        if now - self._last_dump < min_interval:
+            return
+        self._last_dump = now
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, worker_file(directory, os.getpid()))
+
+
+registry = Registry()
+
+
+@contextlib.contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name, **labels):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine):
+    """Time every SQL statement run through ``engine``."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        registry.observe('db_query_duration_seconds', time.perf_counter() - started)
+
+
+def worker_file(directory, pid):
+    return os.path.join(directory, f'metrics-{pid}.json')
+
+
+def remove_worker_file(directory, pid):
+    """Drop the metrics of a worker that has exited."""
+    try:
+        os.remove(worker_file(directory, pid))
+    except FileNotFoundError:
+        pass
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect(directory=None):
+    """Merge the snapshots of every process (or just this one)."""
+    snapshots = [registry.snapshot()]
+    if directory:
+        registry.dump(directory)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            pid = os.path.basename(path)[len('metrics-'):-len('.json')]
+            # Left behind by a worker that died without the child_exit hook
+            if pid.isdigit() and not _is_running(int(pid)):
+                remove_worker_file(directory, pid)
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    histograms = {}
+    counters = collections.Counter()
+    for snapshot in snapshots:
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(tuple(label) for label in labels))] += value
+    return histograms, counters
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus(histograms, counters):
+    """Render merged metrics in the Prometheus text exposition format."""
+    lines = []
+    by_name = collections.defaultdict(list)
+    for (name, labels), values in sorted(histograms.items()):
+        by_name[name].append((labels, values))
+    for name, series in by_name.items():
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, values in series:
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {values[-2]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-2]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-1]}')
+
+    by_name = collections.defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        by_name[name].append((labels, value))
+    for name, series in by_name.items():
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in series:
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Opt-in sampler that keeps stacks of slow requests.
+
+    A daemon thread samples the stacks of threads that are serving a
+    request every ``interval`` seconds. When a request takes longer than
+    ``threshold`` its samples are written to ``directory`` in the folded
+    format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, directory, threshold, interval=0.005):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._thread = None
+        self._pid = None
+
+    def _ensure_running(self):
+        # The sampler thread doesn't survive a fork, start one per worker
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[_fold(frame)] += 1
+
+    def start(self):
+        with self._lock:
+            self._ensure_running()
+            self._active[threading.get_ident()] = collections.Counter()
+
+    def stop(self, duration, label):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or duration < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_')
+        filename = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{safe_label}-{int(duration * 1000)}ms.folded'
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+def _fold(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
@@ -1,9 +1,51 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from datetime import datetime
 
 db = SQLAlchemy()
 
+
+def sqlite_engine_options(config):
+    """Engine options for SQLALCHEMY_ENGINE_OPTIONS built from the SQLITE_* settings.
+
+    Empty when the database URL isn't SQLite.
+    """
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite':
+        return {}
+    options = {
+        'query_cache_size': config['SQLITE_QUERY_CACHE_SIZE'],
+        'connect_args': {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'cached_statements': config['SQLITE_CACHED_STATEMENTS'],
+        },
+    }
+    # In-memory databases get a StaticPool, which takes no sizing options
+    if ':memory:' not in config['SQLALCHEMY_DATABASE_URI']:
+        options['pool_size'] = config['SQLITE_POOL_SIZE']
+        options['max_overflow'] = config['SQLITE_MAX_OVERFLOW']
+    return options
+
+
+def configure_sqlite_engine(engine, config):
+    """Apply the SQLITE_* pragmas to every new connection of a SQLite ``engine``."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
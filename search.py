@@ -0,0 +1,321 @@
+import bisect
+import heapq
+import itertools
+import logging
+import math
+import re
+import threading
+import unicodedata
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Letters and digits; '_' and punctuation separate words, as in FTS5's unicode61
+_WORD = re.compile(r'[^\W_]+')
+
+TITLE = 1
+DESCRIPTION = 2
+# A match in the title counts for more than one in the description
+FIELD_WEIGHTS = {TITLE: 3.0, DESCRIPTION: 1.0}
+
+# Feed entries applied per changes_since call while catching up
+SYNC_BATCH = 10000
+
+# Shorter last words match whole, like the FTS5 table's prefix='2 3' indexes
+MIN_PREFIX_LENGTH = 2
+
+# Matches scored per search; a broad query ranks a sample of its matches
+MAX_CANDIDATES = 2000
+
+# Seconds a search waits for a worker's first index build before giving up
+READY_TIMEOUT = 2.0
+
+
+class SearchUnavailable(Exception):
+    """Raised when the search index is still being built."""
+
+
+def tokenize(text):
+    """Lower-cased words of ``text`` with diacritics removed ('Cập nhật' -> cap, nhat)."""
+    if text is None:
+        return []
+    text = str(text).lower()
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text)
+                       if not unicodedata.combining(c))
+    return _WORD.findall(text)
+
+
+def parse_query(text):
+    """Split a search string into ``(terms, prefix)``.
+
+    Every word but the last must match a whole word; the last one matches
+    any word it starts, so results follow the user as they type. A last
+    word shorter than ``MIN_PREFIX_LENGTH`` would start most words on the
+    board, so it is matched whole as well and ``prefix`` is None.
+    """
+    words = tokenize(text)
+    if words and len(words[-1]) >= MIN_PREFIX_LENGTH:
+        return words[:-1], words[-1]
+    return words, None
+
+
+def score(text, task):
+    """Field-weighted match score of ``task`` for ``text``, 0 if it doesn't match.
+
+    For ranking a handful of tasks that aren't in an index; unlike
+    ``SearchIndex`` it doesn't weigh words by how rare they are.
+    """
+    terms, prefix = parse_query(text)
+    if not terms and prefix is None:
+        return 0.0
+    fields = {}
+    for field, value in ((TITLE, task.get('title')), (DESCRIPTION, task.get('description'))):
+        for word in tokenize(value):
+            fields[word] = fields.get(word, 0) | field
+    total = 0.0
+    for term in terms:
+        if term not in fields:
+            return 0.0
+        total += _weight(fields[term])
+    if prefix is None:
+        return total
+    best = max((_weight(mask) for word, mask in fields.items() if word.startswith(prefix)), default=0.0)
+    return total + best if best else 0.0
+
+
+def _weight(mask):
+    return _MASK_WEIGHTS[mask]
+
+
+# Weight of every title/description combination, indexed by field mask
+_MASK_WEIGHTS = [sum(weight for field, weight in FIELD_WEIGHTS.items() if mask & field)
+                 for mask in range((TITLE | DESCRIPTION) + 1)]
+
+
+class SearchIndex:
+    """In-memory inverted index over task titles and descriptions.
+
+    Postings map each word to ``{task_id: fields}``, where ``fields`` flags
+    whether the word is in the title, the description or both. The index
+    follows ``storage.changes_since`` before every search, so writes made by
+    any worker are picked up incrementally.
+
+    Building it from a snapshot happens on a background thread (``start``),
+    never inside a search. A ``reset`` in the feed (the board was replaced,
+    or more changes happened than the log retains, as after a large import)
+    starts a rebuild there, and searches keep using the current index until
+    the new one is swapped in.
+
+    Results are ranked by summing, over the query words, the word's inverse
+    document frequency weighted by the field it matched in. At most
+    ``MAX_CANDIDATES`` matches are scored: title matches before description
+    ones, rare words before common ones, new tasks before old ones.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._builder_lock = threading.Lock()
+        self._builder = None
+        self._ready = threading.Event()
+        self._seq = None
+        self._postings = {}
+        # The title matches out of each word's postings, walked first
+        self._titles = {}
+        self._docs = {}
+        # Sorted keys of _postings, for prefix lookups. Words whose last
+        # task went away keep an empty postings dict until the next rebuild.
+        self._vocabulary = []
+
+    def _add(self, task):
+        task_id = task['id']
+        self._remove(task_id)
+        fields = {}
+        for word in tokenize(task.get('title')):
+            fields[word] = fields.get(word, 0) | TITLE
+        for word in tokenize(task.get('description')):
+            fields[word] = fields.get(word, 0) | DESCRIPTION
+        for word, mask in fields.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                if self._vocabulary is not None:
+                    bisect.insort(self._vocabulary, word)
+            postings[task_id] = mask
+            if mask & TITLE:
+                self._titles.setdefault(word, {})[task_id] = mask
+        self._docs[task_id] = (tuple(fields), task.get('status'), task.get('priority'))
+
+    def _remove(self, task_id):
+        doc = self._docs.pop(task_id, None)
+        if doc is not None:
+            for word in doc[0]:
+                if self._postings[word].pop(task_id, 0) & TITLE:
+                    del self._titles[word][task_id]
+
+    @timed('task_storage_duration_seconds', operation='index')
+    def _rebuild(self):
+        seq, tasks = self.storage.snapshot()
+        self._postings = {}
+        self._titles = {}
+        self._docs = {}
+        # Sorted once at the end rather than word by word
+        self._vocabulary = None
+        for task in tasks:
+            # First occurrence wins, like storage.get()
+            if task['id'] not in self._docs:
+                self._add(task)
+        self._vocabulary = sorted(self._postings)
+        self._seq = seq
+
+    def start(self):
+        """Build the index in the background unless it is built or being built."""
+        if not self._ready.is_set():
+            self._start_build()
+
+    def _start_build(self):
+        with self._builder_lock:
+            # A builder inherited through a fork isn't alive in the child
+            if self._builder is not None and self._builder.is_alive():
+                return
+            self._builder = threading.Thread(target=self._build, name='search-index', daemon=True)
+            self._builder.start()
+
+    def _building(self):
+        return self._builder is not None and self._builder.is_alive()
+
+    def _build(self):
+        try:
+            # Built on the side, so searches keep using this one meanwhile
+            fresh = SearchIndex(self.storage)
+            fresh._rebuild()
+            with self._lock:
+                self._seq, self._postings, self._titles = fresh._seq, fresh._postings, fresh._titles
+                self._docs, self._vocabulary = fresh._docs, fresh._vocabulary
+            self._ready.set()
+        except Exception:
+            logger.exception('Building the search index failed')
+
+    def wait(self, timeout=None):
+        """Wait for a running build; True if the index is built and none is running."""
+        builder = self._builder
+        if builder is not None:
+            builder.join(timeout)
+        return self._ready.is_set() and not self._building()
+
+    def _sync(self):
+        if self._building():
+            # The rebuild catches up from its own snapshot
+            return
+        while True:
+            feed = self.storage.changes_since(self._seq, SYNC_BATCH)
+            if feed['reset'] or any(change['op'] == 'reset' for change in feed['changes']):
+                self._start_build()
+                return
+            for change in feed['changes']:
+                if change['op'] == 'put':
+                    self._add(change['task'])
+                elif change['op'] == 'delete':
+                    self._remove(change['id'])
+                self._seq = change['seq']
+            if len(feed['changes']) < SYNC_BATCH:
+                return
+
+    def _expand(self, prefix):
+        lo = bisect.bisect_left(self._vocabulary, prefix)
+        hi = bisect.bisect_left(self._vocabulary, prefix + '\U0010ffff', lo)
+        return self._vocabulary[lo:hi]
+
+    def _idf(self, postings):
+        return math.log(1 + len(self._docs) / (len(postings) or 1))
+
+    @timed('task_storage_duration_seconds', operation='search')
+    def search(self, text, status=None, priority=None, limit=50):
+        """Return up to ``limit`` tasks matching ``text``, best match first.
+
+        Raises ``SearchUnavailable`` if this process's first build of the
+        index doesn't finish within ``READY_TIMEOUT`` seconds.
+        """
+        terms, prefix = parse_query(text)
+        if not terms and prefix is None:
+            return []
+        if not self._ready.is_set():
+            self.start()
+            if not self._ready.wait(READY_TIMEOUT):
+                raise SearchUnavailable('The search index is still being built')
+        with self._lock:
+            self._sync()
+            exact = [self._postings.get(term) for term in terms]
+            if not all(exact):
+                return []
+            exact = [(postings, self._idf(postings)) for postings in exact]
+            expanded = None
+            if prefix is not None:
+                expanded = [word for word in self._expand(prefix) if self._postings[word]]
+                if not expanded:
+                    return []
+
+            # Walk whichever is smaller, the rarest whole word or everything
+            # the prefix expands to. Each word's title matches come before
+            # the rest of its postings and words go by the most they can add
+            # to a score, so the MAX_CANDIDATES cap only drops matches that
+            # can't outrank the ones scored. Within a run, newest task first
+            # (ids sort by creation time).
+            rarest = min(terms, key=lambda term: len(self._postings[term]), default=None)
+            if expanded is None or (rarest is not None and len(self._postings[rarest])
+                                    < sum(len(self._postings[word]) for word in expanded)):
+                walk = [(1.0, rarest)]
+            else:
+                walk = [(self._idf(self._postings[word]), word) for word in expanded]
+            runs = []
+            for idf, word in walk:
+                runs.append((idf * _weight(TITLE | DESCRIPTION), self._titles.get(word, {})))
+                runs.append((idf * _weight(DESCRIPTION), self._postings[word]))
+            runs.sort(key=lambda run: run[0], reverse=True)
+            candidates = itertools.chain.from_iterable(reversed(postings) for _, postings in runs)
+
+            ranked = []
+            seen = set()
+            for task_id in candidates:
+                if task_id in seen:
+                    continue
+                seen.add(task_id)
+                doc_words, task_status, task_priority = self._docs[task_id]
+                if status is not None and task_status != status:
+                    continue
+                if priority is not None and task_priority != priority:
+                    continue
+                if not all(task_id in postings for postings, _ in exact):
+                    continue
+                total = sum(idf * _weight(postings[task_id]) for postings, idf in exact)
+                if prefix is not None:
+                    best = max((self._idf(self._postings[word]) * _weight(self._postings[word][task_id])
+                                for word in doc_words if word.startswith(prefix)), default=0.0)
+                    if not best:
+                        continue
+                    total += best
+                # Ties go to the newest task
+                ranked.append((total, task_id))
+                if len(ranked) >= MAX_CANDIDATES:
+                    break
+            top = heapq.nlargest(limit, ranked)
+
+        results = []
+        for _, task_id in top:
+            task = self.storage.get(task_id)
+            if task is not None:
+                results.append(task)
+        return results
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(storage):
+    with _indexes_lock:
+        if storage not in _indexes:
+            _indexes[storage] = SearchIndex(storage)
+        return _indexes[storage]
@@ -0,0 +1,1071 @@
+import bisect
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from metrics import timed
+from search import DESCRIPTION, FIELD_WEIGHTS, TITLE, get_search_index, parse_query, score
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStorage:
+    """Interface shared by the task storage backends."""
+
+    def all(self):
+        raise NotImplementedError
+
+    def replace_all(self, tasks):
+        raise NotImplementedError
+
+    def insert_many(self, tasks):
+        """Add all ``tasks`` in a single write."""
+        raise NotImplementedError
+
+    def update_many(self, updates):
+        """Apply ``(task_id, fields)`` pairs in a single write.
+
+        Returns one entry per update: the merged task, or None if missing.
+        """
+        raise NotImplementedError
+
+    def put_many(self, tasks):
+        """Insert ``tasks``, replacing any stored task with the same id."""
+        raise NotImplementedError
+
+    def insert(self, task):
+        return self.insert_many([task])[0]
+
+    def get(self, task_id):
+        """Return the task with ``task_id``, or None if missing."""
+        raise NotImplementedError
+
+    def update(self, task_id, fields):
+        """Merge ``fields`` into the task and return it, or None if missing."""
+        return self.update_many([(task_id, fields)])[0]
+
+    def delete_many(self, task_ids):
+        """Remove all ``task_ids`` in a single write.
+
+        Returns the ids that existed and were removed.
+        """
+        raise NotImplementedError
+
+    def delete(self, task_id):
+        """Remove the task, returning False if it didn't exist."""
+        return bool(self.delete_many([task_id]))
+
+    def query(self, status=None, priority=None, created_from=None, created_to=None,
+              descending=False, after=None, limit=None):
+        """Return tasks matching the filters, ordered by ``(created_at, id)``.
+
+        ``created_from``/``created_to`` are inclusive bounds on ``created_at``.
+        ``after`` is the ``(created_at, id)`` key of the last task of the
+        previous page; only tasks past it (in the requested order) are returned.
+        """
+        raise NotImplementedError
+
+    def version(self):
+        """Cheap stamp that changes whenever the stored board changes."""
+        raise NotImplementedError
+
+    def changes_since(self, seq, limit=1000):
+        """Return the change log entries after sequence number ``seq``.
+
+        The result is ``{'changes': [...], 'latest': n, 'reset': bool}``.
+        Each change is ``{'seq', 'op', 'id', 'task'}`` with ``op`` one of
+        ``put``, ``delete`` or ``reset`` (the whole board was replaced).
+        ``reset`` is true when ``seq`` is older than the retained log, and
+        the caller has to reload the full board.
+        """
+        raise NotImplementedError
+
+    def latest_change(self):
+        """Sequence number of the newest change log entry (0 if none)."""
+        return self.changes_since(0, limit=0)['latest']
+
+    def snapshot(self):
+        """Return ``(seq, tasks)``: the board and a change sequence number it includes.
+
+        Replaying the change feed from ``seq`` brings a copy of ``tasks`` up
+        to date; entries the board already reflects replay harmlessly.
+        """
+        seq = self.latest_change()
+        return seq, self.all()
+
+    def search(self, text, status=None, priority=None, limit=50):
+        """Return up to ``limit`` tasks whose title or description match ``text``.
+
+        Results are best match first. Every word of ``text`` has to appear,
+        the last one as a prefix.
+        """
+        return get_search_index(self).search(text, status=status, priority=priority, limit=limit)
+
+    def warm_search(self):
+        """Start building what ``search`` needs in the background."""
+        get_search_index(self).start()
+
+    def iter_tasks(self, chunk_size=1000):
+        """Yield every task in ``(created_at, id)`` order, one page at a time."""
+        after = None
+        while True:
+            page = self.query(after=after, limit=chunk_size)
+            yield from page
+            if len(page) < chunk_size:
+                return
+            after = sort_key(page[-1])
+
+
+SORT_FIELDS = ('status', 'priority')
+
+# Compares greater than any task id, for bisecting past all ids of a timestamp
+_MAX_ID = '\U0010ffff'
+
+
+def sort_key(task):
+    return (_text(task.get('created_at')) or '', task['id'])
+
+
+# Fields the backends index and sort on; they have to hold strings
+INDEXED_FIELDS = ('status', 'priority', 'created_at')
+
+
+def validate_task_fields(fields):
+    """Raise ValueError unless ``fields`` is a dict whose indexed fields are strings."""
+    if not isinstance(fields, dict):
+        raise ValueError('Expected a JSON object')
+    for field in INDEXED_FIELDS:
+        if field in fields and not isinstance(fields[field], str):
+            raise ValueError(f'{field} must be a string')
+
+
+def _text(value):
+    # Tasks stored before fields were validated may hold other types
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+# Number of change log entries kept for the change feed
+CHANGE_RETENTION = 10000
+
+
+def _clean_fields(fields):
+    # The id is the storage key, it can't be changed through an update
+    return {k: v for k, v in fields.items() if k != 'id'}
+
+
+class NDJSONTail:
+    """Follows an append-only NDJSON file, parsing only newly added lines.
+
+    ``read()`` returns every entry in the file. The returned list is never
+    modified; a new list is returned when the file grows, and the file
+    being replaced or truncated starts over from scratch.
+
+    The tailed file is kept open, so its inode can't be handed to a
+    replacement file while we still compare against it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+        self._state = (0, [])
+
+    def _reopen(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._state = (0, [])
+        try:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            pass
+
+    def read(self):
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._reopen()
+                return []
+            if self._fd is None:
+                self._reopen()
+            else:
+                held = os.fstat(self._fd)
+                if (held.st_ino, held.st_dev) != (st.st_ino, st.st_dev) or held.st_size < self._state[0]:
+                    self._reopen()
+            if self._fd is None:
+                return []
+            offset, entries = self._state
+            size = os.fstat(self._fd).st_size
+            if size > offset:
+                # pread leaves the offset alone, the fd may be shared after a fork
+                data = os.pread(self._fd, size - offset, offset)
+                # Only take complete lines, a writer may be mid-append
+                end = data.rfind(b'\n') + 1
+                entries = entries + [json.loads(line) for line in data[:end].splitlines()]
+                offset += end
+            self._state = (offset, entries)
+            return entries
+
+
+class ChangeLog:
+    """Append-only NDJSON change log kept next to the JSON board.
+
+    Appends must happen under the storage's write lock. Once the log holds
+    twice ``retention`` entries it is rewritten (and atomically replaced)
+    with the newest ``retention`` ones.
+    """
+
+    def __init__(self, path, retention=CHANGE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._tail = NDJSONTail(path)
+
+    def _entries(self):
+        return self._tail.read()
+
+    def latest(self):
+        entries = self._entries()
+        return entries[-1]['seq'] if entries else 0
+
+    def append(self, changes):
+        """Record ``(op, task_id, task)`` tuples."""
+        entries = self._entries()
+        seq = entries[-1]['seq'] if entries else 0
+        new_entries = []
+        for op, task_id, task in changes:
+            seq += 1
+            new_entries.append({'seq': seq, 'op': op, 'id': task_id, 'task': task})
+        lines = ''.join(json.dumps(entry) + '\n' for entry in new_entries)
+
+        if len(entries) + len(new_entries) > 2 * self.retention:
+            kept = (entries + new_entries)[-self.retention:]
+            directory = os.path.dirname(self.path)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.changes-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in kept)
+            os.replace(tmp_path, self.path)
+        else:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+
+    def since(self, seq, limit=1000):
+        entries = self._entries()
+        latest = entries[-1]['seq'] if entries else 0
+        if not entries or seq >= latest:
+            return {'changes': [], 'latest': latest, 'reset': seq > latest}
+        oldest = entries[0]['seq']
+        if seq < oldest - 1:
+            return {'changes': [], 'latest': latest, 'reset': True}
+        start = seq - oldest + 1
+        return {'changes': entries[start:start + limit], 'latest': latest, 'reset': False}
+
+
+class JSONFileStorage(TaskStorage):
+    """Keeps the whole board in a single JSON list (the original format).
+
+    Writes hold an exclusive ``flock`` on a sidecar lock file so concurrent
+    gunicorn workers don't lose updates, and the new file is written to a
+    temporary file and renamed into place so readers never see a partial
+    write.
+
+    The parsed list is kept in memory together with an id -> position index
+    and is only re-read when the file's version changes, so lookups are O(1)
+    and a mutation only pays for writing the file back out. Snapshots are
+    never modified in place; writes build a new list.
+
+    Every write is also recorded in a ``ChangeLog`` next to the board.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.change_log = ChangeLog(path + '.changes')
+        self._snapshot = (object(), [], {})
+        self._secondary = (None, {})
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @timed('task_storage_duration_seconds', operation='load')
+    def _read(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        return []
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def _write(self, tasks):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tasks-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tasks, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _build_index(tasks):
+        # First occurrence wins, matching the old linear scan
+        index = {}
+        for pos, task in enumerate(tasks):
+            index.setdefault(task['id'], pos)
+        return index
+
+    def _load(self):
+        version = self.version()
+        snapshot = self._snapshot
+        if snapshot[0] == version:
+            return snapshot[1], snapshot[2]
+        tasks = self._read()
+        index = self._build_index(tasks)
+        self._snapshot = (version, tasks, index)
+        return tasks, index
+
+    def _commit(self, tasks, index, changes):
+        # Log first: a crash in between leaves an entry that already carries
+        # the task, rather than a write the feed never hears about
+        self.change_log.append(changes)
+        self._write(tasks)
+        self._snapshot = (self.version(), tasks, index)
+
+    def changes_since(self, seq, limit=1000):
+        return self.change_log.since(seq, limit)
+
+    def snapshot(self):
+        # The log is written before the data, so read both under the write
+        # lock to never pair a sequence number with an older board
+        with self._locked():
+            return self.change_log.latest(), self._load()[0]
+
+    def all(self):
+        return self._load()[0]
+
+    def version(self):
+        # Every write renames a new file into place, so the inode changes even
+        # when two writes land within the same mtime tick with the same size.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self, task_id):
+        tasks, index = self._load()
+        pos = index.get(task_id)
+        return None if pos is None else tasks[pos]
+
+    def _secondary_indexes(self, tasks):
+        """Sorted ``(created_at, id, position)`` lists for the snapshot.
+
+        Key ``None`` covers every task, ``('status', value)`` and
+        ``('priority', value)`` the tasks with that value. Built once per
+        snapshot.
+        """
+        cached_tasks, indexes = self._secondary
+        if cached_tasks is tasks:
+            return indexes
+        indexes = {None: []}
+        for pos, task in enumerate(tasks):
+            entry = sort_key(task) + (pos,)
+            indexes[None].append(entry)
+            for field in SORT_FIELDS:
+                indexes.setdefault((field, _text(task.get(field))), []).append(entry)
+        for entries in indexes.values():
+            entries.sort()
+        self._secondary = (tasks, indexes)
+        return indexes
+
+    def query(self, status=None, priority=None, created_from=None, created_to=None,
+              descending=False, after=None, limit=None):
+        tasks, _ = self._load()
+        indexes = self._secondary_indexes(tasks)
+        filters = {'status': status, 'priority': priority}
+        # Walk the smallest matching index and check the other filter per task
+        candidates = [indexes.get((field, value), []) for field, value in filters.items()
+                      if value is not None] or [indexes[None]]
+        entries = min(candidates, key=len)
+
+        lo, hi = 0, len(entries)
+        if created_from is not None:
+            lo = bisect.bisect_left(entries, (created_from,))
+        if created_to is not None:
+            hi = bisect.bisect_right(entries, (created_to, _MAX_ID))
+        if after is not None:
+            if descending:
+                hi = min(hi, bisect.bisect_left(entries, tuple(after)))
+            else:
+                lo = max(lo, bisect.bisect_right(entries, tuple(after) + (len(tasks),)))
+
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        result = []
+        for i in positions:
+            task = tasks[entries[i][2]]
+            if all(value is None or task.get(field) == value for field, value in filters.items()):
+                result.append(task)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def replace_all(self, tasks):
+        with self._locked():
+            tasks = list(tasks)
+            self._commit(tasks, self._build_index(tasks), [('reset', None, None)])
+
+    def insert_many(self, new_tasks):
+        new_tasks = list(new_tasks)
+        with self._locked():
+            tasks, index = self._load()
+            index = dict(index)
+            for pos, task in enumerate(new_tasks, start=len(tasks)):
+                index.setdefault(task['id'], pos)
+            self._commit(tasks + new_tasks, index,
+                         [('put', task['id'], task) for task in new_tasks])
+        return new_tasks
+
+    def put_many(self, new_tasks):
+        with self._locked():
+            tasks, index = self._load()
+            tasks = list(tasks)
+            index = dict(index)
+            for task in new_tasks:
+                pos = index.get(task['id'])
+                if pos is None:
+                    index[task['id']] = len(tasks)
+                    tasks.append(task)
+                else:
+                    tasks[pos] = task
+            self._commit(tasks, index, [('put', task['id'], task) for task in new_tasks])
+
+    def update_many(self, updates):
+        results = []
+        with self._locked():
+            tasks, index = self._load()
+            tasks = list(tasks)
+            for task_id, fields in updates:
+                pos = index.get(task_id)
+                if pos is None:
+                    results.append(None)
+                    continue
+                task = dict(tasks[pos], **_clean_fields(fields))
+                tasks[pos] = task
+                results.append(task)
+            changes = [('put', task['id'], task) for task in results if task is not None]
+            if changes:
+                self._commit(tasks, index, changes)
+        return results
+
+    def delete_many(self, task_ids):
+        with self._locked():
+            tasks, index = self._load()
+            deleted = list(dict.fromkeys(task_id for task_id in task_ids if task_id in index))
+            if deleted:
+                gone = set(deleted)
+                tasks = [task for task in tasks if task['id'] not in gone]
+                self._commit(tasks, self._build_index(tasks),
+                             [('delete', task_id, None) for task_id in deleted])
+        return deleted
+
+
+class SQLiteStorage(TaskStorage):
+    """Stores one row per task so mutations only touch the affected record.
+
+    The full task dict is kept as JSON in ``data``; the columns used for
+    lookups are copied out next to it. Rows keep insertion order through
+    the implicit rowid.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT NOT NULL UNIQUE,
+            status TEXT,
+            priority TEXT,
+            created_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+        CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created_at, id);
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at, id);
+        CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority, created_at, id);
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            task_id TEXT,
+            data TEXT
+        );
+    """
+
+    # Full-text index over the title and description stored in ``data``,
+    # kept in step by triggers. It is contentless (the text already lives in
+    # ``data``), so removing a row has to hand the old values back to FTS5.
+    FTS_SCHEMA = (
+        """CREATE VIRTUAL TABLE tasks_fts USING fts5(
+            title, description, content='', prefix='2 3',
+            tokenize='unicode61 remove_diacritics 2')""",
+        """CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (
+                new.rowid, json_extract(new.data, '$.title'), json_extract(new.data, '$.description'));
+        END""",
+        """CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES (
+                'delete', old.rowid, json_extract(old.data, '$.title'), json_extract(old.data, '$.description'));
+        END""",
+        """CREATE TRIGGER tasks_fts_update AFTER UPDATE OF data ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES (
+                'delete', old.rowid, json_extract(old.data, '$.title'), json_extract(old.data, '$.description'));
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (
+                new.rowid, json_extract(new.data, '$.title'), json_extract(new.data, '$.description'));
+        END""",
+        """INSERT INTO tasks_fts (rowid, title, description)
+            SELECT rowid, json_extract(data, '$.title'), json_extract(data, '$.description') FROM tasks""",
+    )
+
+    def __init__(self, path, timeout=30.0, change_retention=CHANGE_RETENTION):
+        self.path = path
+        self.timeout = timeout
+        self.change_retention = change_retention
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        self.full_text = self._create_full_text_index(conn)
+
+    def _create_full_text_index(self, conn):
+        """Create (and fill from existing rows) the FTS5 index on first open.
+
+        Returns False if SQLite was built without FTS5, in which case
+        ``search`` falls back to the in-memory index.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone() is None:
+                for statement in self.FTS_SCHEMA:
+                    conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            conn.execute('ROLLBACK')
+            if 'fts5' in str(e):
+                return False
+            raise
+        conn.execute('COMMIT')
+        return True
+
+    def _connect(self):
+        # Connections are per thread, and must not be shared across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Rows dropped by INSERT OR REPLACE must reach the FTS delete trigger
+            conn.execute('PRAGMA recursive_triggers=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences can't interleave with another worker's write.
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        before = conn.total_changes
+        try:
+            yield conn
+            # A transaction that changed nothing leaves caches valid
+            if conn.total_changes != before:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _log_changes(self, conn, changes):
+        conn.executemany(
+            'INSERT INTO changes (op, task_id, data) VALUES (?, ?, ?)',
+            [(op, task_id, None if task is None else json.dumps(task))
+             for op, task_id, task in changes])
+        conn.execute('DELETE FROM changes WHERE seq <= (SELECT max(seq) FROM changes) - ?',
+                     (self.change_retention,))
+
+    @staticmethod
+    def _row(task):
+        return (task['id'], _text(task.get('status')), _text(task.get('priority')),
+                _text(task.get('created_at')) or '', json.dumps(task))
+
+    @timed('task_storage_duration_seconds', operation='load')
+    def all(self):
+        rows = self._connect().execute('SELECT data FROM tasks ORDER BY rowid')
+        return [json.loads(data) for (data,) in rows]
+
+    def version(self):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0]
+
+    def changes_since(self, seq, limit=1000):
+        conn = self._connect()
+        oldest, latest = conn.execute('SELECT min(seq), max(seq) FROM changes').fetchone()
+        latest = latest or 0
+        if latest == 0 or seq >= latest:
+            return {'changes': [], 'latest': latest, 'reset': seq > latest}
+        if seq < oldest - 1:
+            return {'changes': [], 'latest': latest, 'reset': True}
+        rows = conn.execute('SELECT seq, op, task_id, data FROM changes WHERE seq > ? '
+                            'ORDER BY seq LIMIT ?', (seq, limit))
+        changes = [{'seq': row_seq, 'op': op, 'id': task_id,
+                    'task': None if data is None else json.loads(data)}
+                   for row_seq, op, task_id, data in rows]
+        return {'changes': changes, 'latest': latest, 'reset': False}
+
+    @timed('task_storage_duration_seconds', operation='load')
+    def get(self, task_id):
+        row = self._connect().execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    @timed('task_storage_duration_seconds', operation='load')
+    def query(self, status=None, priority=None, created_from=None, created_to=None,
+              descending=False, after=None, limit=None):
+        clauses, params = [], []
+        for column, value in (('status', status), ('priority', priority)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if created_from is not None:
+            clauses.append('created_at >= ?')
+            params.append(created_from)
+        if created_to is not None:
+            clauses.append('created_at <= ?')
+            params.append(created_to)
+        if after is not None:
+            clauses.append(f"(created_at, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        direction = 'DESC' if descending else 'ASC'
+        sql = 'SELECT data FROM tasks'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY created_at {direction}, id {direction}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = self._connect().execute(sql, params)
+        return [json.loads(data) for (data,) in rows]
+
+    def warm_search(self):
+        if not self.full_text:
+            super().warm_search()
+
+    @timed('task_storage_duration_seconds', operation='search')
+    def search(self, text, status=None, priority=None, limit=50):
+        if not self.full_text:
+            return super().search(text, status=status, priority=priority, limit=limit)
+        terms, prefix = parse_query(text)
+        if not terms and prefix is None:
+            return []
+        # Words are letters and digits only, so quoting them is enough to
+        # keep the input out of the FTS5 query syntax
+        words = [f'"{term}"' for term in terms]
+        if prefix is not None:
+            words.append(f'"{prefix}"*')
+        clauses = ['tasks_fts MATCH ?']
+        params = [' '.join(words)]
+        for column, value in (('status', status), ('priority', priority)):
+            if value is not None:
+                clauses.append(f'tasks.{column} = ?')
+                params.append(value)
+        params.append(limit)
+        rows = self._connect().execute(
+            'SELECT tasks.data FROM tasks_fts JOIN tasks ON tasks.rowid = tasks_fts.rowid '
+            f"WHERE {' AND '.join(clauses)} "
+            f'ORDER BY bm25(tasks_fts, {FIELD_WEIGHTS[TITLE]}, {FIELD_WEIGHTS[DESCRIPTION]}), tasks.id DESC '
+            'LIMIT ?', params)
+        return [json.loads(data) for (data,) in rows]
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def replace_all(self, tasks):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM tasks')
+            conn.executemany(
+                'INSERT OR REPLACE INTO tasks (id, status, priority, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [self._row(task) for task in tasks])
+            self._log_changes(conn, [('reset', None, None)])
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def insert_many(self, tasks):
+        tasks = list(tasks)
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT INTO tasks (id, status, priority, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?)', [self._row(task) for task in tasks])
+            self._log_changes(conn, [('put', task['id'], task) for task in tasks])
+        return tasks
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def put_many(self, tasks):
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT INTO tasks (id, status, priority, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET '
+                'status = excluded.status, priority = excluded.priority, '
+                'created_at = excluded.created_at, data = excluded.data',
+                [self._row(task) for task in tasks])
+            self._log_changes(conn, [('put', task['id'], task) for task in tasks])
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def update_many(self, updates):
+        results = []
+        with self._transaction() as conn:
+            for task_id, fields in updates:
+                row = conn.execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+                if row is None:
+                    results.append(None)
+                    continue
+                task = json.loads(row[0])
+                task.update(_clean_fields(fields))
+                conn.execute(
+                    'UPDATE tasks SET status = ?, priority = ?, created_at = ?, data = ? '
+                    'WHERE id = ?', self._row(task)[1:] + (task_id,))
+                results.append(task)
+            self._log_changes(conn, [('put', task['id'], task) for task in results if task is not None])
+        return results
+
+    @timed('task_storage_duration_seconds', operation='save')
+    def delete_many(self, task_ids):
+        deleted = []
+        with self._transaction() as conn:
+            for task_id in dict.fromkeys(task_ids):
+                if conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount:
+                    deleted.append(task_id)
+            if deleted:
+                self._log_changes(conn, [('delete', task_id, None) for task_id in deleted])
+        return deleted
+
+
+class JournaledStorage(TaskStorage):
+    """Write-behind wrapper around another backend.
+
+    Mutations are resolved against the current state, appended to a
+    journal file and fsynced, and acknowledged without touching the main
+    store. Reads merge the pending journal over the wrapped store. Once the
+    journal is ``max_bytes`` large or its oldest entry is ``max_age``
+    seconds old, a background thread compacts it: repeated writes to a task
+    are coalesced to its final state, applied to the wrapped store in one
+    ``put_many`` and one ``delete_many``, and the journal is replaced by an
+    empty file. A write that fills the journal wakes that thread rather
+    than compacting on the caller's time.
+
+    Compaction is idempotent, so a crash half-way just replays the same
+    journal again. Any pending journal is replayed when the storage is
+    opened. The wrapped store's change feed only sees writes once they are
+    compacted.
+    """
+
+    def __init__(self, inner, journal_path, max_bytes=1024 * 1024, max_age=1.0):
+        self.inner = inner
+        self.journal_path = journal_path
+        self.lock_path = journal_path + '.lock'
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._tail = NDJSONTail(journal_path)
+        self._overlay_cache = (None, {})
+        self._flusher_pid = None
+        self._wake = threading.Event()
+        self.flush()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_flusher(self):
+        # One background compactor per worker; threads don't survive a fork
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._run_flusher, name='journal-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            # Woken early by a write that filled the journal
+            self._wake.wait(max(self.max_age / 2, 0.05))
+            self._wake.clear()
+            try:
+                self.flush(only_if_due=True)
+            except Exception:
+                # Keep the thread alive; the next write or tick retries
+                logger.exception('Compacting journal %s failed', self.journal_path)
+
+    def _overlay(self):
+        """``{task_id: task or None}`` for the pending journal (None = deleted)."""
+        entries = self._tail.read()
+        cached_entries, overlay = self._overlay_cache
+        if cached_entries is entries:
+            return overlay
+        overlay = {}
+        for entry in entries:
+            overlay[entry['id']] = entry.get('task')
+        self._overlay_cache = (entries, overlay)
+        return overlay
+
+    @timed('task_storage_duration_seconds', operation='journal')
+    def _append(self, records):
+        now = time.time()
+        with open(self.journal_path, 'a') as f:
+            f.write(''.join(json.dumps(dict(record, ts=now)) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _get(self, task_id, overlay):
+        if task_id in overlay:
+            return overlay[task_id]
+        return self.inner.get(task_id)
+
+    def _write(self, records):
+        if records:
+            self._append(records)
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        return size >= self.max_bytes
+
+    def _is_due(self, entries):
+        if not entries:
+            return False
+        if time.time() - entries[0]['ts'] >= self.max_age:
+            return True
+        return os.path.getsize(self.journal_path) >= self.max_bytes
+
+    def flush(self, only_if_due=False):
+        """Compact the journal into the wrapped store."""
+        with self._locked():
+            self._flush(only_if_due)
+
+    def _flush(self, only_if_due=False):
+        # Caller holds the journal lock
+        entries = self._tail.read()
+        if not entries or (only_if_due and not self._is_due(entries)):
+            return
+        overlay = self._overlay()
+        puts = [task for task in overlay.values() if task is not None]
+        if puts:
+            self.inner.put_many(puts)
+        deletes = [task_id for task_id, task in overlay.items() if task is None]
+        if deletes:
+            self.inner.delete_many(deletes)
+        directory = os.path.dirname(os.path.abspath(self.journal_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.journal-', suffix='.tmp')
+        os.close(fd)
+        os.replace(tmp_path, self.journal_path)
+
+    def all(self):
+        self._ensure_flusher()
+        overlay = self._overlay()
+        tasks = self.inner.all()
+        if not overlay:
+            return tasks
+        result = []
+        for task in tasks:
+            if task['id'] in overlay:
+                task = overlay[task['id']]
+                if task is None:
+                    continue
+            result.append(task)
+        known = {task['id'] for task in tasks}
+        result.extend(task for task_id, task in overlay.items()
+                      if task is not None and task_id not in known)
+        return result
+
+    def version(self):
+        try:
+            st = os.stat(self.journal_path)
+            journal = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            journal = None
+        return (self.inner.version(), journal)
+
+    def get(self, task_id):
+        self._ensure_flusher()
+        return self._get(task_id, self._overlay())
+
+    def query(self, status=None, priority=None, created_from=None, created_to=None,
+              descending=False, after=None, limit=None):
+        self._ensure_flusher()
+        overlay = self._overlay()
+        options = dict(status=status, priority=priority, created_from=created_from,
+                       created_to=created_to, descending=descending, after=after)
+        if not overlay:
+            return self.inner.query(limit=limit, **options)
+        # Ask for enough extra rows to make up for the ones the journal hides
+        fetch = None if limit is None else limit + len(overlay)
+        tasks = [task for task in self.inner.query(limit=fetch, **options)
+                 if task['id'] not in overlay]
+
+        def matches(task):
+            key = sort_key(task)
+            return ((status is None or task.get('status') == status)
+                    and (priority is None or task.get('priority') == priority)
+                    and (created_from is None or key[0] >= created_from)
+                    and (created_to is None or key[0] <= created_to)
+                    and (after is None or (key < tuple(after) if descending else key > tuple(after))))
+
+        tasks.extend(task for task in overlay.values() if task is not None and matches(task))
+        tasks.sort(key=sort_key, reverse=descending)
+        return tasks if limit is None else tasks[:limit]
+
+    def changes_since(self, seq, limit=1000):
+        return self.inner.changes_since(seq, limit)
+
+    def search(self, text, status=None, priority=None, limit=50):
+        self._ensure_flusher()
+        overlay = self._overlay()
+        if not overlay:
+            return self.inner.search(text, status=status, priority=priority, limit=limit)
+        tasks = [task for task in self.inner.search(text, status=status, priority=priority,
+                                                    limit=limit + len(overlay))
+                 if task['id'] not in overlay]
+        # The wrapped store hasn't indexed pending writes yet. They are the
+        # most recent edits, so they go first, ranked among themselves.
+        candidates = (task for task in overlay.values()
+                      if task is not None and (status is None or task.get('status') == status)
+                      and (priority is None or task.get('priority') == priority))
+        pending = sorted(((score(text, task), task['id'], task) for task in candidates),
+                         key=lambda entry: entry[:2], reverse=True)
+        return ([task for task_score, _, task in pending if task_score] + tasks)[:limit]
+
+    def warm_search(self):
+        self.inner.warm_search()
+
+    def replace_all(self, tasks):
+        # Under one lock, so no write lands between compacting and replacing
+        with self._locked():
+            self._flush()
+            self.inner.replace_all(tasks)
+
+    def insert_many(self, tasks):
+        tasks = list(tasks)
+        self.put_many(tasks)
+        return tasks
+
+    def put_many(self, tasks):
+        self._ensure_flusher()
+        with self._locked():
+            due = self._write([{'id': task['id'], 'task': task} for task in tasks])
+        if due:
+            self._wake.set()
+
+    def update_many(self, updates):
+        self._ensure_flusher()
+        results = []
+        with self._locked():
+            overlay = dict(self._overlay())
+            for task_id, fields in updates:
+                task = self._get(task_id, overlay)
+                if task is not None:
+                    task = dict(task, **_clean_fields(fields))
+                    overlay[task_id] = task
+                results.append(task)
+            due = self._write([{'id': task['id'], 'task': task} for task in results if task is not None])
+        if due:
+            self._wake.set()
+        return results
+
+    def delete_many(self, task_ids):
+        self._ensure_flusher()
+        with self._locked():
+            overlay = self._overlay()
+            deleted = [task_id for task_id in dict.fromkeys(task_ids)
+                       if self._get(task_id, overlay) is not None]
+            due = self._write([{'id': task_id, 'task': None} for task_id in deleted])
+        if due:
+            self._wake.set()
+        return deleted
+
+
+BACKENDS = {
+    'json': JSONFileStorage,
+    'sqlite': SQLiteStorage,
+}
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def open_storage(backend, path, write_behind=False, **journal_options):
+    """Return the (per-process) storage instance for ``backend`` at ``path``.
+
+    With ``write_behind`` the backend is wrapped in a ``JournaledStorage``
+    journaling to ``<path>.journal``; ``journal_options`` are passed on to it.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown task storage backend: {backend}')
+    key = (backend, os.path.abspath(path), write_behind)
+    with _storages_lock:
+        if key not in _storages:
+            storage = BACKENDS[backend](path)
+            if write_behind:
+                storage = JournaledStorage(storage, path + '.journal', **journal_options)
+            _storages[key] = storage
+        return _storages[key]
+
+
+def migrate_json_to_sqlite(json_path, sqlite_path):
+    """One-shot copy of a ``tasks.json`` board into a SQLite store.
+
+    Returns ``(migrated, already_present)``; tasks whose id is already in
+    the target are left alone, so re-running the migration is harmless.
+    Raises ValueError, listing the ids, if the source holds the same id more
+    than once: only one copy could be kept, so nothing is migrated until
+    they are renamed (``flask tasks dedupe``).
+    """
+    with open(json_path, 'r') as f:
+        tasks = json.load(f)
+    seen = set()
+    duplicates = []
+    for task in tasks:
+        if task['id'] in seen and task['id'] not in duplicates:
+            duplicates.append(task['id'])
+        seen.add(task['id'])
+    if duplicates:
+        raise ValueError(f"Duplicate task ids in {json_path}: {', '.join(duplicates)}")
+
+    target = open_storage('sqlite', sqlite_path)
+    migrated = already_present = 0
+    with target._transaction() as conn:
+        for task in tasks:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO tasks (id, status, priority, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?)', target._row(task))
+            if cursor.rowcount:
+                migrated += 1
+            else:
+                already_present += 1
+        if migrated:
+            target._log_changes(conn, [('reset', None, None)])
+    return migrated, already_present
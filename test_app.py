@@ -1,4 +1,5 @@
 import pytest
+import base64
 import json
 import os
 from app import app, db
@@ -181,4 +182,378 @@ def test_data_persistence(auth_client):
     with open(data_file, 'r') as f:
         tasks = json.load(f)
         assert len(tasks) == 1
-        assert tasks[0]['title'] == 'Persistence Test'
\ No newline at end of file
+        assert tasks[0]['title'] == 'Persistence Test'
+
+def test_sqlite_storage_backend(auth_client, tmp_path):
+    """Test API trên SQLite storage"""
+    app.config.update(TASK_STORAGE='sqlite', TASK_DB_FILE=str(tmp_path / 'tasks.db'))
+    try:
+        rv = auth_client.post('/api/tasks',
+                        data=json.dumps({'title': 'SQLite Task'}),
+                        content_type='application/json')
+        task_id = rv.get_json()['id']
+        rv = auth_client.put(f'/api/tasks/{task_id}',
+                       data=json.dumps({'status': 'in-progress'}),
+                       content_type='application/json')
+        assert rv.get_json()['status'] == 'in-progress'
+
+        tasks = auth_client.get('/api/tasks').get_json()
+        assert [t['title'] for t in tasks] == ['SQLite Task']
+        assert not os.path.exists(app.config['DATA_FILE'])
+    finally:
+        app.config['TASK_STORAGE'] = 'json'
+
+def test_task_cache(auth_client):
+    """Test cache của danh sách tasks"""
+    auth_client.post('/api/tasks',
+                data=json.dumps({'title': 'Cached Task'}),
+                content_type='application/json')
+    before = auth_client.get('/api/cache/stats').get_json()
+    first = auth_client.get('/api/tasks')
+    second = auth_client.get('/api/tasks')
+    assert first.data == second.data
+    stats = auth_client.get('/api/cache/stats').get_json()
+    assert stats['misses'] == before['misses'] + 1
+    assert stats['hits'] == before['hits'] + 1
+
+    task_id = first.get_json()[0]['id']
+    auth_client.put(f'/api/tasks/{task_id}',
+               data=json.dumps({'status': 'completed'}),
+               content_type='application/json')
+    tasks = auth_client.get('/api/tasks').get_json()
+    assert tasks[0]['status'] == 'completed'
+    assert auth_client.get('/api/cache/stats').get_json()['misses'] == before['misses'] + 2
+
+def test_get_and_delete_task(auth_client):
+    """Test lấy và xóa một task"""
+    rv = auth_client.post('/api/tasks',
+                    data=json.dumps({'title': 'Single Task'}),
+                    content_type='application/json')
+    task_id = rv.get_json()['id']
+
+    rv = auth_client.get(f'/api/tasks/{task_id}')
+    assert rv.status_code == 200
+    assert rv.get_json()['title'] == 'Single Task'
+
+    rv = auth_client.delete(f'/api/tasks/{task_id}')
+    assert rv.status_code == 204
+    assert auth_client.get(f'/api/tasks/{task_id}').status_code == 404
+    assert auth_client.delete(f'/api/tasks/{task_id}').status_code == 404
+
+def test_task_ids_unique(auth_client):
+    """Test ID không bị trùng khi tạo nhiều task liên tiếp"""
+    ids = []
+    for i in range(5):
+        rv = auth_client.post('/api/tasks',
+                        data=json.dumps({'title': f'Task {i}'}),
+                        content_type='application/json')
+        ids.append(rv.get_json()['id'])
+    assert len(set(ids)) == 5
+    assert ids == sorted(ids)
+
+def test_dedupe_command(client):
+    """Test lệnh flask tasks dedupe"""
+    with open(app.config['DATA_FILE'], 'w') as f:
+        json.dump([{'id': '20251026135339', 'title': 'a'},
+                   {'id': '20251026135339', 'title': 'b'}], f)
+    result = app.test_cli_runner().invoke(args=['tasks', 'dedupe'])
+    assert 'Reassigned 1 duplicate task ids' in result.output
+    with open(app.config['DATA_FILE']) as f:
+        ids = [t['id'] for t in json.load(f)]
+    assert ids[0] == '20251026135339'
+    assert len(set(ids)) == 2
+
+def test_task_query_pagination(auth_client):
+    """Test lọc và phân trang danh sách tasks"""
+    for i, priority in enumerate(['high', 'low', 'high', 'high', 'low']):
+        auth_client.post('/api/tasks',
+                    data=json.dumps({'title': f'Task {i}', 'priority': priority}),
+                    content_type='application/json')
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/tasks?priority=high&limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        page = auth_client.get(url).get_json()
+        seen.extend(t['title'] for t in page['tasks'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == ['Task 0', 'Task 2', 'Task 3']
+
+    tasks = auth_client.get('/api/tasks?priority=low&sort=-created_at').get_json()
+    assert [t['title'] for t in tasks] == ['Task 4', 'Task 1']
+
+def test_task_query_validation(auth_client):
+    """Test tham số truy vấn không hợp lệ"""
+    assert auth_client.get('/api/tasks?limit=abc').status_code == 400
+    assert auth_client.get('/api/tasks?limit=0').status_code == 400
+    assert auth_client.get('/api/tasks?sort=title').status_code == 400
+    assert auth_client.get('/api/tasks?cursor=not-a-cursor').status_code == 400
+    for key in ({'a': 1, 'b': 2}, [1, 2], ['a', 'b', 'c']):
+        cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+        assert auth_client.get(f'/api/tasks?cursor={cursor}').status_code == 400
+
+def test_batch_create_and_update(auth_client):
+    """Test tạo và cập nhật tasks hàng loạt"""
+    rv = auth_client.post('/api/tasks/batch',
+                    data=json.dumps([{'title': f'Bulk {i}'} for i in range(3)] + [{'priority': 'high'}]),
+                    content_type='application/json')
+    assert rv.status_code == 200
+    results = rv.get_json()['results']
+    assert [r['status'] for r in results] == [201, 201, 201, 400]
+    ids = [r['task']['id'] for r in results[:3]]
+
+    rv = auth_client.patch('/api/tasks/batch',
+                     data=json.dumps([{'id': ids[0], 'status': 'completed'},
+                                      {'id': 'missing', 'status': 'completed'},
+                                      {'status': 'completed'}]),
+                     content_type='application/json')
+    results = rv.get_json()['results']
+    assert [r['status'] for r in results] == [200, 404, 400]
+    assert results[0]['task']['status'] == 'completed'
+
+    tasks = auth_client.get('/api/tasks').get_json()
+    assert [t['title'] for t in tasks] == ['Bulk 0', 'Bulk 1', 'Bulk 2']
+
+def test_batch_rejects_non_array(auth_client):
+    """Test batch API yêu cầu mảng JSON"""
+    rv = auth_client.post('/api/tasks/batch',
+                    data=json.dumps({'title': 'x'}),
+                    content_type='application/json')
+    assert rv.status_code == 400
+
+def test_export_and_import(auth_client):
+    """Test xuất và nhập tasks dạng NDJSON"""
+    auth_client.post('/api/tasks/batch',
+                data=json.dumps([{'title': f'Export {i}'} for i in range(3)]),
+                content_type='application/json')
+    rv = auth_client.get('/api/tasks/export')
+    assert rv.mimetype == 'application/x-ndjson'
+    lines = rv.data.decode().splitlines()
+    assert len(lines) == 3
+
+    updated = json.loads(lines[0])
+    updated['status'] = 'completed'
+    body = '\n'.join([json.dumps(updated), json.dumps({'title': 'Imported'})]) + '\n'
+    rv = auth_client.post('/api/tasks/import', data=body, content_type='application/x-ndjson')
+    assert rv.get_json() == {'imported': 2, 'errors': []}
+
+    tasks = auth_client.get('/api/tasks').get_json()
+    assert len(tasks) == 4
+    assert tasks[0]['status'] == 'completed'
+
+def test_rehash_on_login(client):
+    """Test mật khẩu được băm lại khi đổi tham số"""
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    try:
+        rv = client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+        assert rv.status_code == 302
+        with app.app_context():
+            user = User.query.filter_by(username='testuser').first()
+            assert user.password.startswith('pbkdf2:sha256:1000$')
+        client.get('/logout')
+        rv = client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+        assert rv.status_code == 302
+    finally:
+        app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+
+def test_load_user_is_cached(client):
+    """Test user được cache và bị xóa khỏi cache khi thay đổi"""
+    from app import load_user
+    from auth import user_cache
+    user_id = User.query.filter_by(username='testuser').first().id
+    user = load_user(str(user_id))
+    assert load_user(str(user_id)) is user
+
+    user = db.session.get(User, user_id)
+    user.email = 'changed@example.com'
+    db.session.commit()
+    assert user_id not in user_cache._entries
+    assert load_user(str(user_id)).email == 'changed@example.com'
+
+def test_register_duplicates(client):
+    """Test đăng ký với username hoặc email đã tồn tại"""
+    rv = client.post('/register', data={'username': 'testuser', 'password': 'x',
+                                        'email': 'other@example.com'}, follow_redirects=True)
+    assert b'Username already exists' in rv.data
+    rv = client.post('/register', data={'username': 'other', 'password': 'x',
+                                        'email': 'test@example.com'}, follow_redirects=True)
+    assert b'Email already registered' in rv.data
+    rv = client.post('/register', data={'username': 'other', 'password': 'x',
+                                        'email': 'other@example.com'})
+    assert rv.status_code == 302
+    assert User.query.filter_by(username='other').first() is not None
+
+def test_sqlite_pragmas(client):
+    """Test cấu hình SQLite được áp dụng cho mỗi kết nối"""
+    with db.engine.connect() as conn:
+        busy_timeout = conn.exec_driver_sql('PRAGMA busy_timeout').scalar()
+        synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+    assert busy_timeout == app.config['SQLITE_BUSY_TIMEOUT_MS']
+    assert synchronous == 1  # NORMAL
+
+def test_engine_options_only_for_sqlite():
+    """Test tùy chọn SQLite không áp dụng cho cơ sở dữ liệu khác"""
+    from models import sqlite_engine_options
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://user@db/tasks')
+    assert sqlite_engine_options(config) == {}
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:////tmp/users.db'
+    assert sqlite_engine_options(config)['connect_args']['cached_statements'] == 256
+
+def test_metrics_endpoint(auth_client):
+    """Test endpoint metrics định dạng Prometheus"""
+    auth_client.get('/api/tasks')
+    auth_client.get('/')
+    rv = auth_client.get('/api/metrics')
+    assert rv.status_code == 200
+    text = rv.data.decode()
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/tasks",status="200"}' in text
+    assert 'template_render_duration_seconds_count{template="index.html"}' in text
+    assert 'json_serialize_duration_seconds_count' in text
+    assert 'db_query_duration_seconds_count' in text
+
+def test_task_etag(auth_client):
+    """Test ETag và If-None-Match cho danh sách tasks"""
+    rv = auth_client.post('/api/tasks',
+                    data=json.dumps({'title': 'ETag Task'}),
+                    content_type='application/json')
+    task_id = rv.get_json()['id']
+
+    for url in ['/api/tasks', '/api/tasks?limit=10', f'/api/tasks/{task_id}']:
+        rv = auth_client.get(url)
+        etag = rv.headers['ETag']
+        rv = auth_client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.data == b''
+
+    auth_client.put(f'/api/tasks/{task_id}',
+               data=json.dumps({'status': 'completed'}),
+               content_type='application/json')
+    rv = auth_client.get('/api/tasks', headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+
+def test_task_change_feed(auth_client):
+    """Test change feed của tasks"""
+    latest = auth_client.get('/api/tasks/changes').get_json()['latest']
+    rv = auth_client.post('/api/tasks',
+                    data=json.dumps({'title': 'Feed Task'}),
+                    content_type='application/json')
+    task_id = rv.get_json()['id']
+    auth_client.delete(f'/api/tasks/{task_id}')
+
+    feed = auth_client.get(f'/api/tasks/changes?since={latest}').get_json()
+    assert [(c['op'], c['id']) for c in feed['changes']] == [('put', task_id), ('delete', task_id)]
+    assert feed['changes'][0]['task']['title'] == 'Feed Task'
+    assert feed['latest'] == latest + 2
+    assert auth_client.get('/api/tasks/changes?since=abc').status_code == 400
+
+def test_task_change_stream(auth_client):
+    """Test Server-Sent Events cho change feed"""
+    latest = auth_client.get('/api/tasks/changes').get_json()['latest']
+    auth_client.post('/api/tasks',
+                data=json.dumps({'title': 'Stream Task'}),
+                content_type='application/json')
+    app.config.update(TASK_STREAM_MAX_SECONDS=0.2, TASK_STREAM_POLL_INTERVAL=0.05)
+    try:
+        rv = auth_client.get('/api/tasks/stream', headers={'Last-Event-ID': str(latest)})
+        body = rv.data.decode()
+    finally:
+        app.config.update(TASK_STREAM_MAX_SECONDS=300, TASK_STREAM_POLL_INTERVAL=1.0)
+    assert rv.mimetype == 'text/event-stream'
+    assert f'id: {latest + 1}\nevent: change\n' in body
+    assert 'Stream Task' in body
+
+def test_write_behind_mode(auth_client, tmp_path):
+    """Test chế độ ghi trễ qua journal"""
+    data_file = str(tmp_path / 'tasks.json')
+    app.config.update(TASK_WRITE_BEHIND=True, TASK_JOURNAL_MAX_AGE=60, DATA_FILE=data_file)
+    try:
+        rv = auth_client.post('/api/tasks',
+                        data=json.dumps({'title': 'Journaled Task'}),
+                        content_type='application/json')
+        task_id = rv.get_json()['id']
+        auth_client.put(f'/api/tasks/{task_id}',
+                   data=json.dumps({'status': 'completed'}),
+                   content_type='application/json')
+        assert not os.path.exists(data_file)
+        assert auth_client.get(f'/api/tasks/{task_id}').get_json()['status'] == 'completed'
+
+        result = app.test_cli_runner().invoke(args=['tasks', 'flush'])
+        assert 'Journal flushed' in result.output
+        with open(data_file) as f:
+            assert [t['status'] for t in json.load(f)] == ['completed']
+    finally:
+        app.config.update(TASK_WRITE_BEHIND=False, TASK_JOURNAL_MAX_AGE=1.0)
+
+def test_readiness_check(client):
+    """Test readiness probe"""
+    rv = client.get('/api/ready')
+    assert rv.status_code == 200
+    assert rv.get_json()['checks'] == {'storage': 'ok', 'database': 'ok'}
+
+def test_create_app_needs_init_db(tmp_path):
+    """Test app factory không tạo schema cho đến khi chạy init-db"""
+    from app import create_app
+    factory_app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+        'DATA_FILE': str(tmp_path / 'tasks.json')
+    })
+    with factory_app.test_client() as factory_client:
+        rv = factory_client.get('/api/ready')
+        assert rv.status_code == 503
+        assert rv.get_json()['checks']['storage'] == 'ok'
+        assert rv.get_json()['checks']['database'] == 'error'
+
+        result = factory_app.test_cli_runner().invoke(args=['init-db'])
+        assert 'Initialized the database' in result.output
+        assert factory_client.get('/api/ready').status_code == 200
+
+def test_search_tasks(auth_client):
+    """Test tìm kiếm task"""
+    for title, priority in [('Sửa lỗi đăng nhập', 'high'), ('Viết tài liệu', 'low'), ('Sửa giao diện', 'low')]:
+        auth_client.post('/api/tasks',
+                    data=json.dumps({'title': title, 'priority': priority}),
+                    content_type='application/json')
+    rv = auth_client.get('/api/tasks/search?q=sua')
+    assert rv.status_code == 200
+    assert {t['title'] for t in rv.get_json()['tasks']} == {'Sửa lỗi đăng nhập', 'Sửa giao diện'}
+    rv = auth_client.get('/api/tasks/search?q=sửa&priority=high')
+    assert [t['title'] for t in rv.get_json()['tasks']] == ['Sửa lỗi đăng nhập']
+    assert len(auth_client.get('/api/tasks/search?q=su&limit=1').get_json()['tasks']) == 1
+    # One letter isn't expanded as a prefix, it has to be a whole word
+    assert auth_client.get('/api/tasks/search?q=s').get_json()['tasks'] == []
+    assert auth_client.get('/api/tasks/search?q=').status_code == 400
+    assert auth_client.get('/api/tasks/search?q=sua&limit=0').status_code == 400
+
+def test_task_fields_must_be_strings(auth_client):
+    """Test status, priority và created_at phải là chuỗi"""
+    rv = auth_client.post('/api/tasks', data=json.dumps({'title': 'a', 'priority': ['x']}),
+                    content_type='application/json')
+    assert rv.status_code == 400
+    task_id = auth_client.post('/api/tasks', data=json.dumps({'title': 'a'}),
+                         content_type='application/json').get_json()['id']
+    rv = auth_client.put(f'/api/tasks/{task_id}', data=json.dumps({'created_at': 5}),
+                   content_type='application/json')
+    assert rv.status_code == 400
+
+    rv = auth_client.post('/api/tasks/batch', data=json.dumps([{'title': 'b', 'priority': 1}]),
+                    content_type='application/json')
+    assert rv.get_json()['results'][0]['status'] == 400
+    rv = auth_client.patch('/api/tasks/batch', data=json.dumps([{'id': task_id, 'status': None}]),
+                     content_type='application/json')
+    assert rv.get_json()['results'][0]['status'] == 400
+
+    assert auth_client.get('/api/tasks?limit=5').status_code == 200
+    assert auth_client.get('/').status_code == 200
+
+def test_login_timeout_is_busy(client):
+    """Test kiểm tra mật khẩu quá thời gian trả về 503"""
+    app.config['PASSWORD_HASH_TIMEOUT'] = 0.0
+    try:
+        rv = client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+    finally:
+        app.config['PASSWORD_HASH_TIMEOUT'] = 10.0
+    assert rv.status_code == 503
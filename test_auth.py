@@ -0,0 +1,60 @@
+import threading
+import pytest
+from auth import LoginBusy, PasswordHasher, UserCache
+
+def test_user_cache_ttl():
+    """Test entries expire after the TTL"""
+    now = [0.0]
+    cache = UserCache(ttl=10, clock=lambda: now[0])
+    calls = []
+    loader = lambda user_id: calls.append(user_id) or f'user-{user_id}'
+
+    assert cache.get(1, loader) == 'user-1'
+    assert cache.get(1, loader) == 'user-1'
+    assert calls == [1]
+    now[0] = 11
+    cache.get(1, loader)
+    assert calls == [1, 1]
+
+def test_user_cache_lru_and_invalidate():
+    """Test the least recently used entry is evicted first"""
+    cache = UserCache(max_size=2)
+    calls = []
+    loader = lambda user_id: calls.append(user_id) or user_id
+    cache.get(1, loader)
+    cache.get(2, loader)
+    cache.get(1, loader)
+    cache.get(3, loader)
+    cache.get(1, loader)
+    assert calls == [1, 2, 3]
+    cache.invalidate(1)
+    cache.get(1, loader)
+    assert calls == [1, 2, 3, 1]
+
+def test_password_hasher_rehash():
+    """Test hashes made with other parameters are flagged for rehash"""
+    old = PasswordHasher(method='pbkdf2:sha256:1000')
+    new = PasswordHasher(method='pbkdf2:sha256:2000')
+    stored = old.hash('secret')
+    assert new.verify(stored, 'secret')
+    assert not new.verify(stored, 'wrong')
+    assert new.needs_rehash(stored)
+    assert not old.needs_rehash(stored)
+
+def test_password_hasher_rejects_when_full():
+    """Test checks fail fast once the queue is full"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', max_pending=1)
+    hasher._slots.acquire()
+    with pytest.raises(LoginBusy):
+        hasher.verify(hasher.hash('secret'), 'secret')
+
+def test_password_hasher_times_out_as_busy():
+    """Test a check that outlives the timeout is reported as busy"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, timeout=0.01)
+    release = threading.Event()
+    hasher._executor.submit(release.wait)
+    try:
+        with pytest.raises(LoginBusy):
+            hasher.verify(hasher.hash('secret'), 'secret')
+    finally:
+        release.set()
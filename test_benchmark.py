@@ -0,0 +1,17 @@
+import json
+import os
+import subprocess
+import sys
+
+def test_benchmark_smoke(tmp_path):
+    """Test the benchmark harness runs end to end on a tiny board"""
+    output = tmp_path / 'bench.json'
+    script = os.path.join(os.path.dirname(__file__), 'benchmark.py')
+    subprocess.run([sys.executable, script, '--sizes', '50', '--requests', '20',
+                    '--clients', '2', '--output', str(output)], check=True)
+    report = json.loads(output.read_text())
+    run = report['runs'][0]
+    assert run['size'] == 50
+    assert sum(e['count'] for e in run['endpoints'].values()) == 20
+    assert all(e['errors'] == 0 for e in run['endpoints'].values())
+    assert run['rss_mb'] > 0
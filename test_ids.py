@@ -0,0 +1,46 @@
+import os
+from ids import ALPHABET, ID_LENGTH, IDGenerator, reassign_duplicate_ids
+
+def test_ids_are_unique_and_sorted():
+    """Test ids within the same millisecond stay unique and ordered"""
+    generator = IDGenerator(clock=lambda: 1761461619.0)
+    ids = [generator.next_id() for _ in range(5000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(i) == ID_LENGTH and set(i) <= set(ALPHABET) for i in ids)
+
+def test_ids_sort_by_time():
+    """Test later timestamps give larger ids, even across workers"""
+    early = IDGenerator(worker_id=9, clock=lambda: 1761461619.000)
+    late = IDGenerator(worker_id=1, clock=lambda: 1761461619.001)
+    assert early.next_id() < late.next_id()
+
+def test_ids_survive_clock_going_backwards():
+    """Test ids keep increasing if the clock steps back"""
+    now = [1761461619.5]
+    generator = IDGenerator(clock=lambda: now[0])
+    first = generator.next_id()
+    now[0] -= 10
+    assert generator.next_id() > first
+
+def test_workers_do_not_collide():
+    """Test two workers in the same millisecond produce different ids"""
+    clock = lambda: 1761461619.0
+    a = IDGenerator(worker_id=1, clock=clock)
+    b = IDGenerator(worker_id=2, clock=clock)
+    assert {a.next_id() for _ in range(100)}.isdisjoint(b.next_id() for _ in range(100))
+
+def test_worker_id_is_the_whole_pid(monkeypatch):
+    """Test pids that share their low 16 bits still get different worker ids"""
+    generator = IDGenerator(clock=lambda: 1761461619.0)
+    monkeypatch.setattr(os, 'getpid', lambda: 4242)
+    first = generator.worker_id
+    monkeypatch.setattr(os, 'getpid', lambda: 4242 + 65536)
+    assert generator.worker_id != first
+
+def test_reassign_duplicate_ids():
+    """Test duplicated legacy ids get replaced"""
+    tasks = [{'id': '20251026135339'}, {'id': '20251026135339'}, {'id': '20251026135419'}]
+    fresh = iter(['NEW1'])
+    assert reassign_duplicate_ids(tasks, new_id=lambda: next(fresh)) == 1
+    assert [t['id'] for t in tasks] == ['20251026135339', 'NEW1', '20251026135419']
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from metrics import Registry, SamplingProfiler, collect, registry, remove_worker_file, render_prometheus
+
+def test_histogram_rendering():
+    """Test buckets are cumulative and labels are rendered"""
+    reg = Registry()
+    reg.observe('http_request_duration_seconds', 0.003, route='/api/tasks')
+    reg.observe('http_request_duration_seconds', 0.2, route='/api/tasks')
+    reg.inc('task_cache_requests_total', result='hit')
+    snapshot = reg.snapshot()
+    histograms = {(n, tuple(map(tuple, l))): v for n, l, v in snapshot['histograms']}
+    counters = {(n, tuple(map(tuple, l))): v for n, l, v in snapshot['counters']}
+    text = render_prometheus(histograms, counters)
+    assert 'http_request_duration_seconds_bucket{route="/api/tasks",le="0.005"} 1' in text
+    assert 'http_request_duration_seconds_bucket{route="/api/tasks",le="+Inf"} 2' in text
+    assert 'http_request_duration_seconds_count{route="/api/tasks"} 2' in text
+    assert 'task_cache_requests_total{result="hit"} 1' in text
+
+def test_collect_merges_worker_files(tmp_path):
+    """Test metrics dumped by other workers are added up"""
+    worker = Registry()
+    worker.inc('task_cache_requests_total', 5, result='miss')
+    # Live pids that aren't this process stand in for the other workers
+    for pid in (1, os.getppid()):
+        (tmp_path / f'metrics-{pid}.json').write_text(json.dumps(worker.snapshot()))
+    key = ('task_cache_requests_total', (('result', 'miss'),))
+    _, counters = collect(str(tmp_path))
+    assert counters[key] == 10 + registry.counters[key]
+
+def test_collect_drops_exited_workers(tmp_path):
+    """Test files of workers that are gone are removed, not summed"""
+    worker = Registry()
+    worker.inc('task_cache_requests_total', 5, result='miss')
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    path = tmp_path / f'metrics-{exited.pid}.json'
+    path.write_text(json.dumps(worker.snapshot()))
+    key = ('task_cache_requests_total', (('result', 'miss'),))
+    _, counters = collect(str(tmp_path))
+    assert counters[key] == registry.counters[key]
+    assert not path.exists()
+
+    remove_worker_file(str(tmp_path), os.getpid())
+    assert not (tmp_path / f'metrics-{os.getpid()}.json').exists()
+
+def test_reset_forgets_inherited_metrics():
+    """Test a forked worker can drop what the preloading master recorded"""
+    reg = Registry()
+    reg.observe('app_startup_seconds', 0.5)
+    reg.inc('task_cache_requests_total', result='hit')
+    reg.reset()
+    assert reg.snapshot() == {'histograms': [], 'counters': []}
+
+def test_profiler_writes_slow_requests(tmp_path):
+    """Test slow requests leave a folded stack file"""
+    profiler = SamplingProfiler(str(tmp_path), threshold=0.01, interval=0.001)
+    profiler.start()
+    time.sleep(0.05)
+    path = profiler.stop(0.05, 'GET /slow')
+    assert path and path.endswith('.folded')
+    with open(path) as f:
+        assert 'test_profiler_writes_slow_requests' in f.read()
+
+    profiler.start()
+    assert profiler.stop(0.001, 'GET /fast') is None
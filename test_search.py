@@ -0,0 +1,122 @@
+import threading
+import pytest
+import search
+from search import SearchIndex, SearchUnavailable, parse_query, score, tokenize
+from storage import JSONFileStorage
+
+def make_task(task_id, title, description='', **fields):
+    task = {'id': task_id, 'title': title, 'description': description,
+            'status': 'pending', 'priority': 'medium', 'created_at': '2025-10-26 13:53:39'}
+    task.update(fields)
+    return task
+
+def test_tokenize():
+    """Test words are lower-cased and lose their diacritics"""
+    assert tokenize('Cập nhật BÁO-cáo_v2, đợt 3!') == ['cap', 'nhat', 'bao', 'cao', 'v2', 'đot', '3']
+    assert tokenize(None) == []
+    assert tokenize(42) == ['42']
+
+def test_parse_query():
+    """Test the last word is the prefix"""
+    assert parse_query('fix login bu') == (['fix', 'login'], 'bu')
+    assert parse_query(' ?! ') == ([], None)
+    # Too short to expand, like the FTS5 prefix indexes
+    assert parse_query('fix b') == (['fix', 'b'], None)
+
+def test_score_prefers_title():
+    """Test a match in the title outranks one in the description"""
+    in_title = make_task('a', 'Deploy server')
+    in_description = make_task('b', 'Server', 'Deploy it')
+    assert score('depl', in_title) > score('depl', in_description) > 0
+    assert score('server deploy', in_title) > 0
+    assert score('deploy server', in_title) > 0
+    assert score('ploy', in_title) == 0
+
+def test_index_ranks_rare_words_higher(tmp_path):
+    """Test a rare query word decides the ranking over a common one"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert_many([make_task(f't{i}', 'Weekly report') for i in range(10)]
+                        + [make_task('rare', 'Report', 'Quarterly weekly'),
+                           make_task('both', 'Quarterly report')])
+    ids = [t['id'] for t in SearchIndex(storage).search('quarterly report')]
+    assert ids == ['both', 'rare']
+
+def test_index_is_updated_incrementally(tmp_path):
+    """Test writes are applied from the change feed instead of rebuilding"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert(make_task('a', 'First task'))
+    index = SearchIndex(storage)
+    assert [t['id'] for t in index.search('first')] == ['a']
+
+    rebuilds = []
+    original = index._start_build
+    index._start_build = lambda: rebuilds.append(1) or original()
+    storage.insert(make_task('b', 'Second task'))
+    storage.update('a', {'title': 'Renamed task'})
+    assert [t['id'] for t in index.search('task')] == ['b', 'a']
+    assert index.search('first') == []
+    assert rebuilds == []
+
+    storage.replace_all([make_task('c', 'Imported task')])
+    index.search('task')
+    assert rebuilds == [1]
+    assert index.wait(5)
+    assert [t['id'] for t in index.search('task')] == ['c']
+
+def test_index_rebuilds_after_missed_changes(tmp_path):
+    """Test falling behind the retained change log triggers a rebuild"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.change_log.retention = 5
+    index = SearchIndex(storage)
+    assert index.search('task') == []
+    for i in range(20):
+        storage.insert(make_task(f't{i:02}', f'Task {i}'))
+    index.search('task')
+    assert index.wait(5)
+    assert len(index.search('task', limit=100)) == 20
+    assert [t['id'] for t in index.search('task 7')] == ['t07']
+    assert [t['id'] for t in index.search('task 1')] == ['t01']
+
+def test_index_builds_in_background(tmp_path, monkeypatch):
+    """Test searches don't wait out a build and use the old index during a rebuild"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert(make_task('a', 'Old task'))
+    release = threading.Event()
+    snapshot = storage.snapshot
+    monkeypatch.setattr(storage, 'snapshot', lambda: release.wait() and snapshot())
+    monkeypatch.setattr(search, 'READY_TIMEOUT', 0.01)
+    index = SearchIndex(storage)
+    with pytest.raises(SearchUnavailable):
+        index.search('old')
+    release.set()
+    assert index.wait(5)
+    assert [t['id'] for t in index.search('old')] == ['a']
+
+    release.clear()
+    storage.replace_all([make_task('a', 'Old task'), make_task('b', 'New task')])
+    assert [t['id'] for t in index.search('task')] == ['a']
+    release.set()
+    assert index.wait(5)
+    assert [t['id'] for t in index.search('task')] == ['b', 'a']
+
+def test_index_caps_scored_matches(tmp_path, monkeypatch):
+    """Test a broad query scores a bounded number of matches, newest first"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert_many([make_task(f't{i}', f'Task {i}') for i in range(10)])
+    monkeypatch.setattr(search, 'MAX_CANDIDATES', 3)
+    index = SearchIndex(storage)
+    assert [t['id'] for t in index.search('ta', limit=10)] == ['t9', 't8', 't7']
+
+def test_index_cap_keeps_best_old_match(tmp_path, monkeypatch):
+    """Test an old title match isn't crowded out by newer description matches"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert_many([make_task('t00000', 'Quarterly report')]
+                        + [make_task(f't{i:05}', 'Weekly', 'Send the report') for i in range(1, 3001)])
+    monkeypatch.setattr(search, 'MAX_CANDIDATES', 100)
+    index = SearchIndex(storage)
+    assert [t['id'] for t in index.search('report', limit=3)] == ['t00000', 't03000', 't02999']
+    assert [t['id'] for t in index.search('rep', limit=1)] == ['t00000']
+    assert [t['id'] for t in index.search('weekly repo', limit=1)] == ['t03000']
+
+    storage.update('t00000', {'title': 'Quarterly'})
+    assert index.search('report', limit=1)[0]['id'] == 't03000'
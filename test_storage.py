@@ -0,0 +1,368 @@
+import json
+import os
+import threading
+import time
+import pytest
+from search import get_search_index
+from storage import (JournaledStorage, JSONFileStorage, SQLiteStorage, migrate_json_to_sqlite,
+                     open_storage)
+
+@pytest.fixture(params=['json', 'sqlite', 'journal-json', 'journal-sqlite'])
+def storage(request, tmp_path):
+    """Fresh storage for each backend, with and without the write-behind journal"""
+    if request.param.endswith('json'):
+        storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'tasks.db'))
+    if request.param.startswith('journal'):
+        storage = JournaledStorage(storage, str(tmp_path / 'tasks.journal'), max_age=60)
+    return storage
+
+def make_task(task_id, **fields):
+    task = {
+        'id': task_id,
+        'title': f'Task {task_id}',
+        'description': '',
+        'status': 'pending',
+        'priority': 'medium',
+        'created_at': '2025-10-26 13:53:39'
+    }
+    task.update(fields)
+    return task
+
+def test_insert_and_all(storage):
+    """Test insertion order is kept"""
+    for task_id in ['b', 'a', 'c']:
+        storage.insert(make_task(task_id))
+    assert [t['id'] for t in storage.all()] == ['b', 'a', 'c']
+
+def test_update(storage):
+    """Test update only touches the given task"""
+    storage.insert(make_task('a'))
+    storage.insert(make_task('b'))
+    updated = storage.update('b', {'status': 'completed', 'id': 'zzz'})
+    assert updated['id'] == 'b'
+    assert updated['status'] == 'completed'
+    statuses = {t['id']: t['status'] for t in storage.all()}
+    assert statuses == {'a': 'pending', 'b': 'completed'}
+
+def test_update_missing(storage):
+    """Test update of an unknown id"""
+    assert storage.update('missing', {'status': 'completed'}) is None
+
+def test_replace_all(storage):
+    """Test replacing the whole board"""
+    storage.insert(make_task('a'))
+    storage.replace_all([make_task('x'), make_task('y')])
+    assert [t['id'] for t in storage.all()] == ['x', 'y']
+
+def test_json_write_is_atomic(tmp_path):
+    """Test no temporary files are left behind"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage.insert(make_task('a'))
+    assert sorted(os.listdir(tmp_path)) == ['tasks.json', 'tasks.json.changes', 'tasks.json.lock']
+
+def test_open_storage_unknown_backend(tmp_path):
+    """Test unknown backend names are rejected"""
+    with pytest.raises(ValueError):
+        open_storage('redis', str(tmp_path / 'tasks'))
+
+def test_migrate_json_to_sqlite(tmp_path):
+    """Test migration from tasks.json"""
+    source = tmp_path / 'tasks.json'
+    source.write_text(json.dumps([make_task('a'), make_task('b', status='completed')]))
+    target = str(tmp_path / 'tasks.db')
+
+    assert migrate_json_to_sqlite(str(source), target) == (2, 0)
+    assert migrate_json_to_sqlite(str(source), target) == (0, 2)
+    tasks = SQLiteStorage(target).all()
+    assert [t['id'] for t in tasks] == ['a', 'b']
+    assert tasks[1]['status'] == 'completed'
+
+def test_migrate_rejects_duplicate_ids(tmp_path):
+    """Test migration refuses to drop a task that shares its id"""
+    source = tmp_path / 'tasks.json'
+    source.write_text(json.dumps([make_task('a', status='completed'), make_task('a'), make_task('b')]))
+    target = str(tmp_path / 'tasks.db')
+    with pytest.raises(ValueError, match='Duplicate task ids in .*: a$'):
+        migrate_json_to_sqlite(str(source), target)
+    assert SQLiteStorage(target).all() == []
+
+def test_delete_many(storage):
+    """Test a batch delete removes what exists and reports it"""
+    storage.insert_many([make_task('a'), make_task('b'), make_task('c')])
+    assert storage.delete_many(['c', 'missing', 'a', 'c']) == ['c', 'a']
+    assert [t['id'] for t in storage.all()] == ['b']
+    before = storage.version()
+    assert storage.delete_many(['missing']) == []
+    assert storage.version() == before
+
+def test_version_changes_on_write(storage):
+    """Test the version stamp follows writes"""
+    before = storage.version()
+    storage.insert(make_task('a'))
+    after_insert = storage.version()
+    storage.update('a', {'status': 'completed'})
+    assert len({before, after_insert, storage.version()}) == 3
+    assert storage.version() == storage.version()
+
+def test_get_and_delete(storage):
+    """Test lookup and removal by id"""
+    storage.insert(make_task('a'))
+    storage.insert(make_task('b'))
+    assert storage.get('b')['title'] == 'Task b'
+    assert storage.get('missing') is None
+
+    assert storage.delete('a') is True
+    assert storage.delete('a') is False
+    assert storage.get('a') is None
+    assert storage.get('b')['id'] == 'b'
+    assert [t['id'] for t in storage.all()] == ['b']
+
+def test_json_index_follows_other_writers(tmp_path):
+    """Test the in-memory index is refreshed when another process writes"""
+    path = str(tmp_path / 'tasks.json')
+    storage = JSONFileStorage(path)
+    storage.insert(make_task('a'))
+    assert storage.get('a') is not None
+
+    other = JSONFileStorage(path)
+    other.update('a', {'status': 'completed'})
+    other.insert(make_task('b'))
+    assert storage.get('a')['status'] == 'completed'
+    assert storage.get('b') is not None
+
+def seed_board(storage):
+    storage.replace_all([
+        make_task('t1', status='pending', priority='high', created_at='2025-10-26 10:00:00'),
+        make_task('t2', status='completed', priority='low', created_at='2025-10-26 11:00:00'),
+        make_task('t3', status='pending', priority='low', created_at='2025-10-26 11:00:00'),
+        make_task('t4', status='pending', priority='high', created_at='2025-10-26 12:00:00'),
+        make_task('t5', status='in-progress', priority='high', created_at='2025-10-26 13:00:00'),
+    ])
+
+def test_query_filters(storage):
+    """Test status/priority/created_at filters"""
+    seed_board(storage)
+    ids = lambda tasks: [t['id'] for t in tasks]
+    assert ids(storage.query()) == ['t1', 't2', 't3', 't4', 't5']
+    assert ids(storage.query(status='pending')) == ['t1', 't3', 't4']
+    assert ids(storage.query(status='pending', priority='high')) == ['t1', 't4']
+    assert ids(storage.query(priority='high', descending=True)) == ['t5', 't4', 't1']
+    assert ids(storage.query(created_from='2025-10-26 11:00:00',
+                             created_to='2025-10-26 12:00:00')) == ['t2', 't3', 't4']
+    assert storage.query(status='unknown') == []
+
+def test_query_pages(storage):
+    """Test keyset pagination in both directions"""
+    seed_board(storage)
+    ids = lambda tasks: [t['id'] for t in tasks]
+    assert ids(storage.query(limit=2, after=('2025-10-26 11:00:00', 't2'))) == ['t3', 't4']
+    assert ids(storage.query(descending=True, limit=2,
+                             after=('2025-10-26 11:00:00', 't3'))) == ['t2', 't1']
+    assert ids(storage.query(status='pending', after=('2025-10-26 10:00:00', 't1'))) == ['t3', 't4']
+
+def test_batch_writes(storage):
+    """Test bulk insert and update"""
+    storage.insert_many([make_task(f't{i}') for i in range(100)])
+    results = storage.update_many([('t5', {'status': 'completed'}),
+                                   ('missing', {'status': 'completed'}),
+                                   ('t5', {'priority': 'high'})])
+    assert results[1] is None
+    assert results[2]['status'] == 'completed'
+    assert results[2]['priority'] == 'high'
+    assert len(storage.all()) == 100
+    assert storage.get('t5')['priority'] == 'high'
+
+def test_query_tolerates_non_string_fields(storage):
+    """Test tasks stored before validation with odd field types don't break queries"""
+    storage.insert_many([make_task('a', priority=['x'], created_at=5), make_task('b')])
+    assert {t['id'] for t in storage.query()} == {'a', 'b'}
+    assert [t['id'] for t in storage.query(priority='medium')] == ['b']
+    assert len(list(storage.iter_tasks(chunk_size=1))) == 2
+
+def test_put_many_and_iter_tasks(storage):
+    """Test upserts and chunked iteration"""
+    storage.insert_many([make_task(f't{i:02d}') for i in range(10)])
+    storage.put_many([make_task('t03', status='completed'), make_task('new')])
+    assert storage.get('t03')['status'] == 'completed'
+    assert len(storage.all()) == 11
+    assert len(list(storage.iter_tasks(chunk_size=3))) == 11
+
+def test_change_feed(storage):
+    """Test writes are recorded in order"""
+    if isinstance(storage, JournaledStorage):
+        pytest.skip('the journal only feeds changes on compaction')
+    start = storage.changes_since(0)['latest']
+    storage.insert(make_task('a'))
+    storage.update('a', {'status': 'completed'})
+    storage.delete('a')
+    feed = storage.changes_since(start)
+    assert [(c['op'], c['id']) for c in feed['changes']] == [('put', 'a'), ('put', 'a'), ('delete', 'a')]
+    assert feed['changes'][1]['task']['status'] == 'completed'
+    assert feed['latest'] == start + 3 and not feed['reset']
+    assert storage.changes_since(feed['latest'])['changes'] == []
+    assert storage.changes_since(feed['latest'] + 5)['reset']
+
+    storage.replace_all([])
+    assert storage.changes_since(feed['latest'])['changes'][0]['op'] == 'reset'
+
+def test_change_feed_retention(tmp_path):
+    """Test old entries are dropped and stale readers are told to reset"""
+    for storage in (JSONFileStorage(str(tmp_path / 'tasks.json')),
+                    SQLiteStorage(str(tmp_path / 'tasks.db'), change_retention=5)):
+        if isinstance(storage, JSONFileStorage):
+            storage.change_log.retention = 5
+        for i in range(20):
+            storage.insert(make_task(f't{i}'))
+        feed = storage.changes_since(0)
+        assert feed['reset'] and feed['latest'] == 20
+        recent = storage.changes_since(17)
+        assert [c['id'] for c in recent['changes']] == ['t17', 't18', 't19']
+
+def test_journal_defers_and_coalesces(tmp_path):
+    """Test journaled writes reach the main store once, on compaction"""
+    inner = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    journal_path = str(tmp_path / 'tasks.json.journal')
+    storage = JournaledStorage(inner, journal_path, max_age=60)
+    start = inner.latest_change()
+
+    storage.insert(make_task('a'))
+    for status in ['in-progress', 'completed', 'pending']:
+        storage.update('a', {'status': status})
+    storage.insert(make_task('b'))
+    storage.delete('b')
+    assert inner.all() == []
+    assert [t['status'] for t in storage.all()] == ['pending']
+
+    # A second worker sees the pending writes too
+    other = JournaledStorage(JSONFileStorage(inner.path), journal_path, max_age=60)
+    assert other.get('a')['status'] == 'pending'
+
+    storage.flush()
+    assert os.path.getsize(journal_path) == 0
+    assert [t['status'] for t in inner.all()] == ['pending']
+    ops = [(c['op'], c['id']) for c in inner.changes_since(start)['changes']]
+    assert ops == [('put', 'a')]
+    assert other.get('a')['status'] == 'pending'
+
+def test_journal_replayed_on_open(tmp_path):
+    """Test a journal left behind by a crash is applied at startup"""
+    inner = SQLiteStorage(str(tmp_path / 'tasks.db'))
+    journal_path = str(tmp_path / 'tasks.db.journal')
+    storage = JournaledStorage(inner, journal_path, max_age=60)
+    storage.insert_many([make_task('a'), make_task('b')])
+    storage.update('b', {'status': 'completed'})
+    assert inner.all() == []
+
+    JournaledStorage(SQLiteStorage(inner.path), journal_path, max_age=60)
+    assert {t['id']: t['status'] for t in inner.all()} == {'a': 'pending', 'b': 'completed'}
+
+def test_journal_compacts_when_full(tmp_path):
+    """Test filling the journal wakes the background compactor instead of the writer compacting"""
+    inner = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    storage = JournaledStorage(inner, str(tmp_path / 'tasks.json.journal'), max_bytes=500, max_age=60)
+    flushers = []
+    original = storage.flush
+    storage.flush = lambda *args, **kwargs: flushers.append(threading.current_thread().name) or original(*args, **kwargs)
+    for i in range(10):
+        storage.insert(make_task(f't{i}'))
+    deadline = time.time() + 5
+    while len(inner.all()) < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(inner.all()) >= 5
+    assert set(flushers) == {'journal-flusher'}
+    assert len(storage.all()) == 10
+
+def test_journal_compacts_deletes_in_one_write(tmp_path):
+    """Test pending deletes reach the main store as a single batch"""
+    inner = SQLiteStorage(str(tmp_path / 'tasks.db'))
+    storage = JournaledStorage(inner, str(tmp_path / 'tasks.db.journal'), max_age=60)
+    storage.insert_many([make_task('a'), make_task('b'), make_task('c')])
+    storage.flush()
+    start = inner.latest_change()
+    storage.delete('a')
+    storage.delete('c')
+    storage.insert(make_task('d'))
+    storage.delete('d')
+    calls = []
+    original = inner.delete_many
+    inner.delete_many = lambda task_ids: calls.append(list(task_ids)) or original(task_ids)
+    storage.flush()
+    assert calls == [['a', 'c', 'd']]
+    assert [(c['op'], c['id']) for c in inner.changes_since(start)['changes']] == [('delete', 'a'), ('delete', 'c')]
+    assert [t['id'] for t in storage.all()] == ['b']
+
+def test_journal_follows_replaced_journal(tmp_path):
+    """Test a reader isn't fooled by the new journal reusing the old one's inode"""
+    inner = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    journal_path = str(tmp_path / 'tasks.json.journal')
+    writer = JournaledStorage(inner, journal_path, max_age=60)
+    reader = JournaledStorage(JSONFileStorage(inner.path), journal_path, max_age=60)
+    writer.insert(make_task('a', title='x' * 200))
+    for i in range(3):
+        writer.update('a', {'title': f'long title {i} ' * 20})
+        assert reader.get('a')['title'].startswith(f'long title {i}')
+        writer.flush()
+        writer.update('a', {'status': 'completed', 'title': f'short {i}'})
+        assert reader.get('a')['title'] == f'short {i}'
+        writer.flush()
+
+def test_journal_replace_all_compacts_first(tmp_path):
+    """Test replacing the board applies the pending journal and leaves it empty"""
+    inner = SQLiteStorage(str(tmp_path / 'tasks.db'))
+    journal_path = str(tmp_path / 'tasks.db.journal')
+    storage = JournaledStorage(inner, journal_path, max_age=60)
+    storage.insert(make_task('a'))
+    storage.replace_all([make_task('b')])
+    assert os.path.getsize(journal_path) == 0
+    assert [t['id'] for t in storage.all()] == ['b']
+
+def test_search(storage):
+    """Test full-text search follows writes, with prefixes, ranking and filters"""
+    storage.insert_many([
+        make_task('a', title='Cập nhật báo cáo', description='Gửi cho khách hàng'),
+        make_task('b', title='Review code', description='Cập nhật tài liệu', status='completed'),
+        make_task('c', title='Deploy server', priority='high'),
+    ])
+    # Title matches rank above description matches; diacritics are optional
+    assert [t['id'] for t in storage.search('cap nhat')] == ['a', 'b']
+    assert [t['id'] for t in storage.search('cập nh')] == ['a', 'b']
+    assert [t['id'] for t in storage.search('dep')] == ['c']
+    assert [t['id'] for t in storage.search('cap', status='completed')] == ['b']
+    assert storage.search('cap', priority='high') == []
+    assert storage.search('nhat cap x') == []
+    assert storage.search('"*) OR (') == []
+
+    storage.update('c', {'title': 'Release server'})
+    storage.delete('a')
+    storage.insert(make_task('d', title='Deploy again'))
+    assert [t['id'] for t in storage.search('deploy')] == ['d']
+    assert [t['id'] for t in storage.search('release')] == ['c']
+    assert [t['id'] for t in storage.search('cap')] == ['b']
+
+    storage.replace_all([make_task('e', title='Fresh board')])
+    assert storage.search('deploy') == []
+    # The in-memory index is rebuilt in the background after a reset
+    get_search_index(getattr(storage, 'inner', storage)).wait()
+    assert [t['id'] for t in storage.search('fre', limit=1)] == ['e']
+
+def test_search_ranks_old_title_match_first(storage):
+    """Test every backend puts the oldest task first when only it matches in the title"""
+    storage.insert_many([make_task('t00000', title='Quarterly report')]
+                        + [make_task(f't{i:05}', title='Weekly', description='Send the report')
+                           for i in range(1, 3001)])
+    assert [t['id'] for t in storage.search('report', limit=2)] == ['t00000', 't03000']
+
+def test_search_index_for_existing_sqlite_board(tmp_path):
+    """Test the FTS index is filled from rows written before it existed"""
+    path = str(tmp_path / 'tasks.db')
+    storage = SQLiteStorage(path)
+    storage.insert(make_task('a', title='Old task'))
+    conn = storage._connect()
+    for name in ('tasks_fts_insert', 'tasks_fts_delete', 'tasks_fts_update'):
+        conn.execute(f'DROP TRIGGER {name}')
+    conn.execute('DROP TABLE tasks_fts')
+    storage = SQLiteStorage(path)
+    assert storage.full_text
+    assert [t['id'] for t in storage.search('old')] == ['a']
@@ -0,0 +1,44 @@
+import json
+from storage import JSONFileStorage
+from transfer import export_ndjson, import_ndjson
+
+def test_export_import_roundtrip(tmp_path):
+    """Test an export can be imported into an empty board"""
+    source = JSONFileStorage(str(tmp_path / 'source.json'))
+    source.insert_many([{'id': f't{i:03d}', 'title': f'Task {i}', 'description': '', 'status': 'pending',
+                         'priority': 'low', 'created_at': '2025-10-26 13:53:39'}
+                        for i in range(25)])
+    lines = list(export_ndjson(source, chunk_size=10))
+    assert len(lines) == 25
+
+    target = JSONFileStorage(str(tmp_path / 'target.json'))
+    assert import_ndjson(target, lines, chunk_size=10) == (25, [])
+    assert target.all() == source.all()
+
+def test_import_reports_bad_lines(tmp_path):
+    """Test bad lines are skipped and reported"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    lines = [json.dumps({'title': 'ok'}), 'not json', '', json.dumps({'description': 'x'})]
+    imported, errors = import_ndjson(storage, lines)
+    assert imported == 1
+    assert [e['line'] for e in errors] == [2, 4]
+    task = storage.all()[0]
+    assert task['status'] == 'pending' and task['id']
+
+def test_import_rejects_non_string_fields(tmp_path):
+    """Test lines whose indexed fields aren't strings are reported, not stored"""
+    storage = JSONFileStorage(str(tmp_path / 'tasks.json'))
+    lines = [json.dumps({'title': 'a', 'created_at': 5}), json.dumps({'title': 'b', 'status': None}),
+             json.dumps({'title': 'c', 'priority': ['x']}), json.dumps({'title': 'd'}),
+             json.dumps({'id': '', 'title': 'e'}), json.dumps({'id': 7, 'title': 'f'}),
+             json.dumps({'id': None, 'title': 'g'})]
+    imported, errors = import_ndjson(storage, lines)
+    assert imported == 2
+    assert errors == [{'line': 1, 'error': 'created_at must be a string'},
+                      {'line': 2, 'error': 'status must be a string'},
+                      {'line': 3, 'error': 'priority must be a string'},
+                      {'line': 5, 'error': 'id must be a non-empty string'},
+                      {'line': 6, 'error': 'id must be a non-empty string'}]
+    exported = [json.loads(line) for line in export_ndjson(storage)]
+    assert [t['title'] for t in exported] == ['d', 'g']
+    assert all(t['id'] and t['id'] != 'None' for t in exported)
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+
+from ids import new_task_id
+from storage import validate_task_fields
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def export_ndjson(storage, chunk_size=CHUNK_SIZE):
+    """Yield the board as NDJSON lines, reading storage one page at a time."""
+    for task in storage.iter_tasks(chunk_size):
+        yield json.dumps(task, separators=(',', ':')) + '\n'
+
+
+def normalize_task(data):
+    """Fill in the fields a task needs, keeping whatever the export carried."""
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    if not isinstance(data.get('title'), str) or not data['title']:
+        raise ValueError('Task needs a title')
+    task = {
+        'id': new_task_id(),
+        'title': data['title'],
+        'description': '',
+        'status': 'pending',
+        'priority': 'medium',
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    task.update(data)
+    if task['id'] is None:
+        task['id'] = new_task_id()
+    elif not isinstance(task['id'], str) or not task['id']:
+        raise ValueError('id must be a non-empty string')
+    validate_task_fields(task)
+    return task
+
+
+def import_ndjson(storage, lines, chunk_size=CHUNK_SIZE):
+    """Write NDJSON ``lines`` into storage in chunks of ``chunk_size``.
+
+    Tasks whose id already exists are replaced. Returns ``(imported,
+    errors)`` where errors lists the first bad lines with their reason.
+    """
+    imported = 0
+    errors = []
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append(normalize_task(json.loads(line)))
+        except ValueError as e:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': number, 'error': str(e)})
+            continue
+        if len(chunk) >= chunk_size:
+            storage.put_many(chunk)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        storage.put_many(chunk)
+        imported += len(chunk)
+    return imported, errors
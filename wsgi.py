@@ -1,4 +1,20 @@
-from app import app
+import time
+
+_started = time.perf_counter()
+
+import gc
+
+from app import create_app, warm_up
+from metrics import registry
+
+app = create_app()
+warm_up(app)
+registry.observe('app_startup_seconds', time.perf_counter() - _started)
+
+# With gunicorn --preload this module runs once in the master. Freezing what
+# it built keeps the garbage collector from touching (and so copying) those
+# pages in every forked worker.
+gc.freeze()
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()